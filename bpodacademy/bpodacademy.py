@@ -8,13 +8,23 @@ from tkinter import (
     Entry,
     Button,
     StringVar,
+    Frame,
+    OptionMenu,
+    Text,
+    Canvas,
+    Scrollbar,
+    READABLE,
 )
 from tkinter.ttk import Combobox
 
 import os
+from functools import partial
+import itertools
+import pickle
 from pathlib import Path
 import pathlib
 import platform
+import time
 
 if platform.system() == "Windows":
     pathlib.PosixPath = pathlib.WindowsPath
@@ -24,10 +34,6 @@ from distutils.util import strtobool
 
 import zmq
 
-try:
-    from bpodacademy.server import BpodAcademyServer
-except ModuleNotFoundError:
-    pass
 from bpodacademy.frame import BpodFrame
 from bpodacademy.exception import BpodAcademyError
 
@@ -38,12 +44,26 @@ class BpodAcademy(Tk):
 
     GRID_WIDTH = 15
     FRAMES_PER_ROW = 3
-    INTER_COLUMN_WIDTH = 3
+    BOX_PADDING_PX = 20
+    SCREEN_MARGIN_PX = 100
 
     ZMQ_REQUEST_RCVTIMEO_MS = 30000
     ZMQ_CONNECT_TIMEO_MS = 1000
-    ZMQ_SUBSCRIBE_RCVTIMEO_MS = 1
     ZMQ_SUBSCRIBE_FREQUENCY_MS = 100
+    ZMQ_SUBSCRIBE_FASTEST_MS = 10
+    ZMQ_SUBSCRIBE_HWM = 100000
+    ZMQ_READ_BATCH = 32
+    CHECK_PROTOCOL_MS = 1000
+    PORTS_CACHE_SEC = 30.0
+    TRAINING_CONFIGS_CACHE_SEC = 2.0
+    FETCH_CACHE_SEC = 5.0
+    # settings value converters, also tried in this order when no type is given
+    SETTINGS_CONVERTERS = {
+        "int": int,
+        "float": float,
+        "bool": lambda v: bool(strtobool(v)),
+        "string": str,
+    }
 
     ### Object methods ###
 
@@ -53,9 +73,13 @@ class BpodAcademy(Tk):
         self.withdraw()
 
         self.remote = remote
-        self.ip = ip if ip is not "*" else "localhost"
+        self.ip = ip if ip != "*" else "localhost"
         self.port = port
-        self.zmq_context = zmq.Context()
+        # one context (and io thread) shared with a local server and the frames
+        self.zmq_context = zmq.Context.instance()
+        self.request = None
+        # set while the server is being closed, which finishes asynchronously
+        self.closing = False
 
         ### if not remote, start server ###
         if not self.remote:
@@ -70,7 +94,10 @@ class BpodAcademy(Tk):
 
             if not cfg:
 
-                # start server
+                # start server (imported here: it pulls in matlab.engine and cv2,
+                # which remote clients may not have installed)
+                from bpodacademy.server import BpodAcademyServer
+
                 self.server = BpodAcademyServer(self.bpod_dir, ip, port)
                 self.server.start()
 
@@ -79,10 +106,9 @@ class BpodAcademy(Tk):
             self._connect_remote_to_server()
 
             cfg_file = Path(f"{self.bpod_dir}/Academy/AcademyConfig.csv")
-            has_cfg = True
-            if not cfg_file.is_file():
-                has_cfg = False
-            elif cfg_file.stat().st_size == 0:
+            try:
+                has_cfg = os.stat(cfg_file).st_size > 0
+            except FileNotFoundError:
                 has_cfg = False
             if not has_cfg:
                 begin_config = messagebox.askokcancel(
@@ -110,10 +136,14 @@ class BpodAcademy(Tk):
         # create window
         if hasattr(self, "cfg"):
             self._create_window()
+            self._create_message_handlers()
 
             # start reading server commands
-            self.listen_to_server = self.after(
-                BpodAcademy.ZMQ_SUBSCRIBE_FREQUENCY_MS, self._listen_to_server
+            self._start_listening()
+
+            # check running protocols for all boxes on a single timer
+            self.check_protocols = self.after(
+                BpodAcademy.CHECK_PROTOCOL_MS, self._check_running_protocols
             )
 
             self.deiconify()
@@ -142,18 +172,42 @@ class BpodAcademy(Tk):
         self.ip = ip if ip is not None else self.ip
         self.port = port if port is not None else self.port
 
+        # a failed attempt leaves the request socket waiting on a reply, so
+        # close the previous sockets rather than reuse or leak them
+        if self.request is not None:
+            self._disconnect_remote()
+
         # create 2 sockets:
         # request: submits requests to server
         # subscribe: receives commands from server
 
         self.request = self.zmq_context.socket(zmq.REQ)
+        self.request.setsockopt(zmq.LINGER, 0)
+        # after a timed out request, allow the next one and drop the late reply
+        self.request.setsockopt(zmq.REQ_RELAXED, 1)
+        self.request.setsockopt(zmq.REQ_CORRELATE, 1)
+        self.request.setsockopt(zmq.SNDTIMEO, BpodAcademy.ZMQ_CONNECT_TIMEO_MS)
         self.request.connect(f"tcp://{self.ip}:{self.port}")
 
         self.subscribe = self.zmq_context.socket(zmq.SUB)
-        self.subscribe.setsockopt(zmq.RCVTIMEO, BpodAcademy.ZMQ_SUBSCRIBE_RCVTIMEO_MS)
+        self.subscribe.setsockopt(zmq.LINGER, 0)
+        # queue a long burst of updates rather than silently dropping some
+        self.subscribe.setsockopt(zmq.RCVHWM, BpodAcademy.ZMQ_SUBSCRIBE_HWM)
         self.subscribe.subscribe("")
         self.subscribe.connect(f"tcp://{self.ip}:{self.port+1}")
 
+        # dealer: background requests, matched to their replies by id
+        self.dealer = self.zmq_context.socket(zmq.DEALER)
+        self.dealer.setsockopt(zmq.LINGER, 0)
+        self.dealer.connect(f"tcp://{self.ip}:{self.port}")
+        self.request_count = itertools.count()
+        self.pending_requests = {}
+
+        # only receive from the sockets when a message is waiting
+        self.poller = zmq.Poller()
+        self.poller.register(self.subscribe, zmq.POLLIN)
+        self.poller.register(self.dealer, zmq.POLLIN)
+
         # look for connection
         reply = self._remote_to_server(
             ("CONFIG", "ACADEMY"),
@@ -178,12 +232,14 @@ class BpodAcademy(Tk):
                     self.cameras = None
                 if window is not None:
                     window.destroy()
-                    window.quit()
 
     def _disconnect_remote(self):
 
-        self.request.close()
-        self.subscribe.close()
+        # drop unsent messages, the server may already be gone
+        self.request.close(linger=0)
+        self.subscribe.close(linger=0)
+        self.dealer.close(linger=0)
+        self.request = None
 
     def _connect_remote_to_server_window(self):
 
@@ -210,9 +266,9 @@ class BpodAcademy(Tk):
             ),
         ).grid(sticky="nsew", row=2, column=1)
 
-        connect_window.protocol("WM_DELETE_WINDOW", connect_window.quit)
-
-        connect_window.mainloop()
+        # wait for the window to close without nesting another mainloop
+        # (not transient: the root window is still withdrawn at this point)
+        self.wait_window(connect_window)
 
     def _create_window(self):
 
@@ -271,11 +327,11 @@ class BpodAcademy(Tk):
         )
         training_menu.add_command(
             label="Load Training Configuration",
-            command=lambda: self._select_training_config(mode="load"),
+            command=partial(self._select_training_config, mode="load"),
         )
         training_menu.add_command(
             label="Delete Training Configuration",
-            command=lambda: self._select_training_config(mode="delete"),
+            command=partial(self._select_training_config, mode="delete"),
         )
         menubar.add_cascade(label="Training", menu=training_menu)
 
@@ -284,30 +340,92 @@ class BpodAcademy(Tk):
         # create bpod frames for each box
 
         self.bpod_frames = []
+        self.bpod_index = {}
+        self.create_settings_window = None
+        self.new_sub_window = None
+        self.box_cell_size = None
+        self.box_items = {}
+        self.refresh_protocols_pending = False
+        self.port_values_time = None
+        self.training_configs_time = None
+        self.fetch_cache = {}
+        self._get_port_values()
+        self._get_protocol_values()
+
+        # boxes are drawn as canvas windows, so large academies can scroll
+        self.box_canvas = Canvas(self, highlightthickness=0)
+        box_scrollbar = Scrollbar(
+            self, orient="vertical", command=self.box_canvas.yview
+        )
+        self.box_canvas.configure(yscrollcommand=box_scrollbar.set)
+        self.box_canvas.grid(sticky="nsew", row=0, column=0)
+        box_scrollbar.grid(sticky="ns", row=0, column=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
 
-        Label(self).grid(row=0, column=0)
+        # fetch the status of every box in one request
+        statuses = self._remote_to_server(("BPOD", "QUERY", "ALL"))
+        statuses = statuses if statuses is not None else {}
 
-        for i in range(len(self.cfg["bpod_ids"])):
+        for bpod_id, bpod_serial, bpod_position in zip(
+            self.cfg["bpod_ids"], self.cfg["bpod_serials"], self.cfg["bpod_positions"]
+        ):
 
             self._add_box(
-                self.cfg["bpod_ids"][i],
-                self.cfg["bpod_serials"][i],
-                self.cfg["bpod_positions"][i],
+                bpod_id,
+                bpod_serial,
+                bpod_position,
+                status=statuses.get(bpod_id),
+                redraw=False,
             )
 
+        # the window is still withdrawn, so all of the boxes are laid out
+        # together here, in one pass, before it is shown
+        self._redraw_grid()
+
         self.protocol("WM_DELETE_WINDOW", self._close_bpod_academy)
 
+    def _get_protocol_values(self):
+
+        # one tuple of protocols, shared by all comboboxes and kept current by
+        # the PROTOCOLS messages published when the server refreshes them
+        protocols = self._remote_to_server(("PROTOCOLS",))
+        self.protocols = tuple(protocols) if protocols is not None else ()
+
+        return self.protocols
+
+    def _get_port_values(self, refresh=False):
+
+        # reuse a recent port list unless a refresh was asked for
+        if (
+            (not refresh)
+            and (self.port_values_time is not None)
+            and (time.monotonic() - self.port_values_time < BpodAcademy.PORTS_CACHE_SEC)
+        ):
+            return self.port_values
+
+        # one tuple of serial port choices, shared by all comboboxes
+        all_ports = self._remote_to_server(("PORTS",))
+        all_ports = all_ports if all_ports is not None else []
+        self.port_values = tuple(p[0] for p in all_ports) + ("EMU",)
+        self.port_values_time = time.monotonic()
+
+        return self.port_values
+
     def _refresh_bpod_ports(self):
 
         status = self._remote_to_server(("PORTS", "REFRESH"))
+        if status:
+            self._get_port_values(refresh=True)
+            for fr in self.bpod_frames:
+                fr.set_ports(self.port_values)
 
-    def _add_box(self, bpod_id, bpod_serial, position):
+    def _add_box(self, bpod_id, bpod_serial, position, status=None, redraw=True):
 
-        status = self._remote_to_server(("BPOD", "QUERY", bpod_id))
+        if status is None:
+            status = self._remote_to_server(("BPOD", "QUERY", bpod_id))
         camera_settings = (
-            self.cameras[bpod_id]
-            if (self.cameras is not None) and (bpod_id in self.cameras)
-            else None
+            self.cameras.get(bpod_id) if self.cameras is not None else None
         )
 
         self.bpod_frames.append(
@@ -316,23 +434,22 @@ class BpodAcademy(Tk):
                 bpod_serial,
                 camera_settings=camera_settings,
                 status=status,
+                port_values=self.port_values,
+                protocol_values=self.protocols,
                 request_socket=self.request,
+                background_request=self._remote_to_server_in_background,
+                fetch_request=self._fetch_from_server,
                 subscribe_socket=self.subscribe,
-                parent=self,
+                ip=self.ip,
+                port=self.port,
+                parent=self.box_canvas,
                 remote=self.remote,
             )
         )
+        self.bpod_index[bpod_id] = len(self.bpod_frames) - 1
 
-        index = len(self.bpod_frames) - 1
-        row = int(2 * position[0])
-        col = int(2 * position[1])
-
-        if col > 0:
-            Label(self, width=BpodAcademy.INTER_COLUMN_WIDTH).grid(
-                row=0, column=col - 1
-            )
-        self.bpod_frames[index].grid(row=row, column=col)
-        Label(self).grid(row=row + 1, column=col)
+        if redraw:
+            self._redraw_grid()
 
     def _add_box_window(self):
 
@@ -344,12 +461,11 @@ class BpodAcademy(Tk):
         Entry(new_box_window, textvariable=new_id).grid(sticky="nsew", row=0, column=1)
 
         new_port = StringVar(new_box_window)
-        all_ports = self._remote_to_server(("PORTS",))
         Label(new_box_window, text="Serial Port: ").grid(sticky="w", row=1, column=0)
         Combobox(
             new_box_window,
             textvariable=new_port,
-            values=[p[0] for p in all_ports] + ["EMU"],
+            values=self._get_port_values(),
         ).grid(sticky="nsew", row=1, column=1)
 
         new_box_row = StringVar(new_box_window)
@@ -423,7 +539,7 @@ class BpodAcademy(Tk):
         if not bpod_id:
             return
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         if self.bpod_frames[bpod_index].status == 2:
 
@@ -462,23 +578,62 @@ class BpodAcademy(Tk):
 
     def _remove_box(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index.pop(bpod_id)
         self.cfg["bpod_ids"].pop(bpod_index)
         self.cfg["bpod_serials"].pop(bpod_index)
-        self.bpod_frames[bpod_index].destroy()
-        self.bpod_frames.pop(bpod_index)
-        self._redraw_grid()
+        self.cfg["bpod_positions"].pop(bpod_index)
+        self.box_canvas.delete(self.box_items.pop(bpod_id)[0])
+        self.bpod_frames.pop(bpod_index).destroy()
 
-    def _redraw_grid(self):
+        # only the boxes after the removed one shift down
+        for i in range(bpod_index, len(self.cfg["bpod_ids"])):
+            self.bpod_index[self.cfg["bpod_ids"][i]] = i
 
-        for i in range(len(self.bpod_frames)):
+        self._redraw_grid()
 
-            self.bpod_frames[i].grid_forget()
+    def _redraw_grid(self):
 
-            row = 2 * (1 + (i % BpodAcademy.FRAMES_PER_COLUMN)) - 1
-            column = 2 * int(i / BpodAcademy.FRAMES_PER_COLUMN)
+        if not self.bpod_frames:
+            self.box_canvas.configure(scrollregion=(0, 0, 0, 0))
+            return
 
-            self.bpod_frames[i].grid(row=row, column=column)
+        # every box gets the same cell, sized to the largest frame. all frames
+        # share one layout, so this is only measured on the first redraw
+        pad = BpodAcademy.BOX_PADDING_PX
+        if self.box_cell_size is None:
+            self.update_idletasks()
+            self.box_cell_size = (
+                max(fr.winfo_reqwidth() for fr in self.bpod_frames) + pad,
+                max(fr.winfo_reqheight() for fr in self.bpod_frames) + pad,
+            )
+        cell_width, cell_height = self.box_cell_size
+
+        # only boxes that are new or whose cell moved are touched
+        n_rows = n_cols = 0
+        for fr, (row, col) in zip(self.bpod_frames, self.cfg["bpod_positions"]):
+            row, col = int(row), int(col)
+            xy = (pad + col * cell_width, pad + row * cell_height)
+            item = self.box_items.get(fr.bpod_id)
+            if item is None:
+                self.box_items[fr.bpod_id] = (
+                    self.box_canvas.create_window(*xy, window=fr, anchor="nw"),
+                    xy,
+                )
+            elif item[1] != xy:
+                self.box_canvas.coords(item[0], *xy)
+                self.box_items[fr.bpod_id] = (item[0], xy)
+            n_rows = max(n_rows, row + 1)
+            n_cols = max(n_cols, col + 1)
+
+        # show everything up to the screen size, and scroll past that
+        width = pad + n_cols * cell_width
+        height = pad + n_rows * cell_height
+        margin = BpodAcademy.SCREEN_MARGIN_PX
+        self.box_canvas.configure(
+            scrollregion=(0, 0, width, height),
+            width=min(width, self.winfo_screenwidth() - margin),
+            height=min(height, self.winfo_screenheight() - margin),
+        )
 
     def _refresh_protocols_command(self):
 
@@ -492,25 +647,52 @@ class BpodAcademy(Tk):
 
     def _refresh_protocols(self, protocols):
 
-        for i in range(len(self.bpod_frames)):
-            self.bpod_frames[i].set_protocols(protocols)
+        # a refresh rescans the bpod directory, so fetched lists may be stale
+        self.fetch_cache.clear()
+
+        # nothing to redraw if the protocol list did not change
+        protocols = tuple(protocols)
+        if protocols == self.protocols:
+            return
+        self.protocols = protocols
+
+        # frames are updated once when idle, however many refreshes arrive
+        if not self.refresh_protocols_pending:
+            self.refresh_protocols_pending = True
+            self.after_idle(self._apply_protocols)
+
+    def _apply_protocols(self):
+
+        self.refresh_protocols_pending = False
+
+        # every frame shares the same tuple of values
+        for fr in self.bpod_frames:
+            fr.set_protocols(self.protocols)
 
     def _add_new_subject_window(self):
 
+        # the window is built once and hidden on close, so just reset and show it
+        if self.new_sub_window is not None:
+            self.reset_new_sub_window()
+            self.new_sub_window.deiconify()
+            self.new_sub_window.lift()
+            return
+
         new_sub_window = Toplevel(self)
         new_sub_window.title("Add New Subject")
-
-        protocols = self._remote_to_server(("PROTOCOLS",))
+        new_sub_window.protocol("WM_DELETE_WINDOW", new_sub_window.withdraw)
+        self.new_sub_window = new_sub_window
 
         Label(new_sub_window, text="Protocol: ").grid(sticky="w", row=0, column=0)
         new_sub_protocol = StringVar(new_sub_window)
-        Combobox(
+        new_sub_protocol_entry = Combobox(
             new_sub_window,
             textvariable=new_sub_protocol,
-            values=protocols,
+            values=self.protocols,
             state="readonly",
             width=BpodAcademy.GRID_WIDTH,
-        ).grid(sticky="nsew", row=0, column=1)
+        )
+        new_sub_protocol_entry.grid(sticky="nsew", row=0, column=1)
 
         Label(new_sub_window, text="Subject: ").grid(sticky="w", row=1, column=0)
         new_sub_name = StringVar(new_sub_window)
@@ -518,6 +700,14 @@ class BpodAcademy(Tk):
             sticky="nsew", row=1, column=1
         )
 
+        # clear the previous entries
+        def reset_new_sub_window():
+            new_sub_protocol_entry["values"] = self.protocols
+            new_sub_protocol.set("")
+            new_sub_name.set("")
+
+        self.reset_new_sub_window = reset_new_sub_window
+
         Button(
             new_sub_window,
             text="Submit",
@@ -525,28 +715,34 @@ class BpodAcademy(Tk):
                 new_sub_protocol.get(), new_sub_name.get(), new_sub_window
             ),
         ).grid(sticky="nsew", row=2, column=1)
-        Button(new_sub_window, text="Cancel", command=new_sub_window.destroy).grid(
+        Button(new_sub_window, text="Cancel", command=new_sub_window.withdraw).grid(
             sticky="nsew", row=3, column=1
         )
 
     def _add_new_subject_command(self, protocol, subject, window=None):
 
-        reply = self._remote_to_server(("SUBJECTS", "ADD", protocol, subject))
-        if not reply:
-            messagebox.showwarning(
-                "Add Subject Failed",
-                f"Failed to add subject {subject} on protocol {protocol}. Please check server connection!",
-                parent=self,
-            )
-        else:
-            messagebox.showinfo(
-                "Subject Added",
-                f"Subject {subject} added to protocol {protocol}. Please (re)select the protocol from the dropdown menu to update the subject list.",
-                parent=self,
-            )
+        # the server creates the subject's folders, so don't block the gui on it
+        def add_subject_reply(reply):
+            self.fetch_cache.clear()
+            if not reply:
+                messagebox.showwarning(
+                    "Add Subject Failed",
+                    f"Failed to add subject {subject} on protocol {protocol}. Please check server connection!",
+                    parent=self,
+                )
+            else:
+                messagebox.showinfo(
+                    "Subject Added",
+                    f"Subject {subject} added to protocol {protocol}. Please (re)select the protocol from the dropdown menu to update the subject list.",
+                    parent=self,
+                )
 
         if window is not None:
-            window.destroy()
+            window.withdraw()
+
+        self._remote_to_server_in_background(
+            ("SUBJECTS", "ADD", protocol, subject), add_subject_reply
+        )
 
     def _copy_settings_window(self):
 
@@ -556,7 +752,7 @@ class BpodAcademy(Tk):
         ### Select settings to copy from ###
         Label(copy_settings_window, text="Copy From").grid(sticky="w", row=0, column=0)
 
-        protocols = self._remote_to_server(("PROTOCOLS",))
+        protocols = self.protocols
         Label(copy_settings_window, text="Protocol: ").grid(sticky="w", row=1, column=0)
         copy_from_protocol = StringVar(copy_settings_window)
         copy_from_protocol_entry = Combobox(
@@ -567,12 +763,36 @@ class BpodAcademy(Tk):
             width=BpodAcademy.GRID_WIDTH,
         )
 
+        # lists are fetched in the background and kept while the window is open,
+        # so a repeated selection is not fetched again
+        fetched = {}
+
+        def fetch_list(msg, set_values):
+            if msg in fetched:
+                set_values(fetched[msg])
+            else:
+
+                def store_values(values):
+                    if values is not None:
+                        values = fetched[msg] = tuple(values)
+                    set_values(values)
+
+                self._remote_to_server_in_background(msg, store_values)
+
+        # a reply is dropped if the window has closed or the selection it was
+        # fetched for has since changed
         def update_copy_from_sub(event=None):
-            copy_from_subject_entry["values"] = self._remote_to_server(
-                ("SUBJECTS", "FETCH", copy_from_protocol.get())
-            )
+            protocol = copy_from_protocol.get()
             copy_from_subject.set("")
 
+            def set_subjects(subjects):
+                if (copy_settings_window.winfo_exists()) and (
+                    protocol == copy_from_protocol.get()
+                ):
+                    copy_from_subject_entry["values"] = subjects
+
+            fetch_list(("SUBJECTS", "FETCH", protocol), set_subjects)
+
         copy_from_protocol_entry.bind("<<ComboboxSelected>>", update_copy_from_sub)
         copy_from_protocol_entry.grid(sticky="nsew", row=1, column=1)
 
@@ -586,11 +806,19 @@ class BpodAcademy(Tk):
         )
 
         def update_copy_from_settings(event=None):
-            copy_from_settings_entry["values"] = self._remote_to_server(
-                ("SETTINGS", "FETCH", copy_from_protocol.get(), copy_from_subject.get())
-            )
+            protocol = copy_from_protocol.get()
+            subject = copy_from_subject.get()
             copy_from_settings.set("")
 
+            def set_settings(settings):
+                if (copy_settings_window.winfo_exists()) and (
+                    (protocol, subject)
+                    == (copy_from_protocol.get(), copy_from_subject.get())
+                ):
+                    copy_from_settings_entry["values"] = settings
+
+            fetch_list(("SETTINGS", "FETCH", protocol, subject), set_settings)
+
         copy_from_subject_entry.bind("<<ComboboxSelected>>", update_copy_from_settings)
         copy_from_subject_entry.grid(sticky="nsew", row=2, column=1)
 
@@ -621,11 +849,17 @@ class BpodAcademy(Tk):
         )
 
         def update_copy_to_subject(event=None):
-            copy_to_subject_entry["values"] = ["All"] + self._remote_to_server(
-                ("SUBJECTS", "FETCH", copy_to_protocol.get())
-            )
+            protocol = copy_to_protocol.get()
             copy_to_subject.set("")
 
+            def set_subjects(subjects):
+                if (copy_settings_window.winfo_exists()) and (
+                    protocol == copy_to_protocol.get()
+                ):
+                    copy_to_subject_entry["values"] = ("All",) + (subjects or ())
+
+            fetch_list(("SUBJECTS", "FETCH", protocol), set_subjects)
+
         copy_to_protocol_entry.bind("<<ComboboxSelected>>", update_copy_to_subject)
         copy_to_protocol_entry.grid(sticky="nsew", row=6, column=1)
 
@@ -669,7 +903,20 @@ class BpodAcademy(Tk):
         window=None,
     ):
 
-        reply = self._remote_to_server(
+        # copying to "All" subjects can take a while, so don't block the gui on it
+        def copy_settings_reply(reply):
+            self.fetch_cache.clear()
+            if not reply:
+                messagebox.showwarning(
+                    "Failed to copy settings",
+                    f"Failed to copy settings {copy_from_settings} from protocol {copy_from_protocol} and subject {copy_from_subject} to protocol {copy_to_protocol} and subject {copy_to_subject}",
+                    parent=self,
+                )
+
+        if window is not None:
+            window.destroy()
+
+        self._remote_to_server_in_background(
             (
                 "SETTINGS",
                 "COPY",
@@ -678,182 +925,177 @@ class BpodAcademy(Tk):
                 copy_from_settings,
                 copy_to_protocol,
                 copy_to_subject,
-            )
+            ),
+            copy_settings_reply,
         )
-        if not reply:
-            messagebox.showwarning(
-                "Failed to copy settings",
-                f"Failed to copy settings {copy_from_settings} from protocol {copy_from_protocol} and subject {copy_from_subject} to protocol {copy_to_protocol} and subject {copy_to_subject}",
-                parent=self,
-            )
-
-        if window is not None:
-            window.destroy()
 
     def _create_settings_window(self, window=None):
 
         if window is not None:
             window.destroy()
 
+        # the window is built once and hidden on close, so just reset and show it
+        if self.create_settings_window is not None:
+            self.reset_create_settings_window()
+            self.create_settings_window.deiconify()
+            self.create_settings_window.lift()
+            return
+
         create_settings_window = Toplevel(self)
         create_settings_window.title("Create Settings File")
-
-        protocols = self._remote_to_server(("PROTOCOLS",))
-        Label(create_settings_window, text="Protocol: ").grid(
-            sticky="w", row=0, column=0
+        create_settings_window.protocol(
+            "WM_DELETE_WINDOW", create_settings_window.withdraw
         )
+        self.create_settings_window = create_settings_window
+
+        # protocol/subject/file, parameters and buttons each get a frame
+        header_frame = Frame(create_settings_window)
+        fields_frame = Frame(create_settings_window)
+        buttons_frame = Frame(create_settings_window)
+        header_frame.pack(side="top", fill="x", pady=(0, 20))
+        fields_frame.pack(side="top", fill="x")
+        buttons_frame.pack(side="top", fill="x")
+
+        Label(header_frame, text="Protocol: ").grid(sticky="w", row=0, column=0)
         settings_protocol = StringVar(create_settings_window)
         settings_protocol_entry = Combobox(
-            create_settings_window,
+            header_frame,
             textvariable=settings_protocol,
-            values=protocols,
             state="readonly",
             width=BpodAcademy.GRID_WIDTH,
         )
 
         def update_settings_subject(event=None):
-            settings_subject_entry["values"] = ["All"] + self._remote_to_server(
+            subjects = self._fetch_from_server(
                 ("SUBJECTS", "FETCH", settings_protocol.get())
             )
-            settings_subject.set("")
+            set_settings_subjects(("All",) + (subjects or ()))
 
         settings_protocol_entry.bind("<<ComboboxSelected>>", update_settings_subject)
         settings_protocol_entry.grid(row=0, column=1)
 
-        Label(create_settings_window, text="Subject: ").grid(
-            sticky="w", row=1, column=0
-        )
+        Label(header_frame, text="Subject: ").grid(sticky="w", row=1, column=0)
+        # subjects can only be picked from the list, so a plain OptionMenu does
         settings_subject = StringVar(create_settings_window)
-        settings_subject_entry = Combobox(
-            create_settings_window,
-            textvariable=settings_subject,
-            state="readonly",
-            width=BpodAcademy.GRID_WIDTH,
-        )
+        settings_subject_entry = OptionMenu(header_frame, settings_subject, "")
+        settings_subject_entry.config(width=BpodAcademy.GRID_WIDTH)
         settings_subject_entry.grid(sticky="nsew", row=1, column=1)
+        settings_subject_menu = settings_subject_entry["menu"]
 
-        Label(create_settings_window, text="Settings: ").grid(
-            sticky="w", row=2, column=0
-        )
+        def set_settings_subjects(subjects):
+            settings_subject_menu.delete(0, "end")
+            for subject in subjects:
+                settings_subject_menu.add_command(
+                    label=subject, command=partial(settings_subject.set, subject)
+                )
+            settings_subject.set("")
+
+        set_settings_subjects(())
+
+        Label(header_frame, text="Settings: ").grid(sticky="w", row=2, column=0)
         settings_file = StringVar(create_settings_window)
         Entry(
-            create_settings_window,
-            textvariable=settings_file,
-            width=BpodAcademy.GRID_WIDTH,
+            header_frame, textvariable=settings_file, width=BpodAcademy.GRID_WIDTH
         ).grid(sticky="nsew", row=2, column=1)
 
-        Label(create_settings_window).grid(row=3, column=0)
-
-        Label(create_settings_window, text="Names").grid(row=4, column=0)
-        Label(create_settings_window, text="Values").grid(row=4, column=1)
-        Label(create_settings_window, text="Data Types").grid(row=4, column=2)
+        # all parameters go in one text box, one "name value [type]" per line
+        Label(
+            fields_frame,
+            text="Parameters (name value [int, float, bool or string] per line)",
+        ).pack(side="top", anchor="w")
+        settings_text = Text(fields_frame, height=10, width=3 * BpodAcademy.GRID_WIDTH)
+        settings_text.pack(side="top", fill="x")
 
-        settings_names = []
-        settings_values = []
-        settings_dtypes = []
+        # clear the previous entries
+        def reset_create_settings_window():
+            settings_protocol_entry["values"] = self.protocols
+            settings_protocol.set("")
+            set_settings_subjects(())
+            settings_file.set("")
+            settings_text.delete("1.0", "end")
 
-        def add_settings_field():
-            settings_names.append(StringVar(create_settings_window))
-            Entry(
-                create_settings_window,
-                textvariable=settings_names[-1],
-                width=BpodAcademy.GRID_WIDTH,
-            ).grid(row=4 + len(settings_names), column=0)
-            settings_values.append(StringVar(create_settings_window))
-            Entry(
-                create_settings_window,
-                textvariable=settings_values[-1],
-                width=BpodAcademy.GRID_WIDTH,
-            ).grid(row=4 + len(settings_values), column=1)
-            settings_dtypes.append(StringVar(create_settings_window))
-            Combobox(
-                create_settings_window,
-                textvariable=settings_dtypes[-1],
-                values=["int", "float", "bool", "string"],
-                width=BpodAcademy.GRID_WIDTH,
-            ).grid(row=4 + len(settings_dtypes), column=2)
-
-        add_settings_field()
-        Button(
-            create_settings_window, text="Add Parameter", command=add_settings_field
-        ).grid(sticky="nsew", row=100, column=0)
+        self.reset_create_settings_window = reset_create_settings_window
 
-        Label(create_settings_window).grid(row=101, column=0)
+        settings_protocol_entry["values"] = self.protocols
 
         Button(
-            create_settings_window,
+            buttons_frame,
             text="Create File",
             command=lambda: self._create_settings_command(
                 settings_protocol.get(),
                 settings_subject.get(),
                 settings_file.get(),
-                settings_names,
-                settings_values,
-                settings_dtypes,
-                create_settings_window,
+                settings_text.get("1.0", "end"),
             ),
-        ).grid(sticky="nsew", row=102, column=0)
+        ).grid(sticky="nsew", row=0, column=0, pady=(20, 0))
         Button(
-            create_settings_window,
-            text="Cancel",
-            command=create_settings_window.destroy,
-        ).grid(sticky="nsew", row=102, column=1)
+            buttons_frame, text="Cancel", command=create_settings_window.withdraw
+        ).grid(sticky="nsew", row=0, column=1, pady=(20, 0))
 
-        # create_settings_window.mainloop()
+    def _create_settings_command(self, protocol, subject, settings_file, parameters):
 
-    def _create_settings_command(
-        self, protocol, subject, settings_file, names, values, dtypes, window=None
-    ):
-
-        # create dictionary from user settings
+        # create dictionary from user settings, one "name value [type]" per line
         settings_dict = {}
-        for n, v, dt in zip(names, values, dtypes):
-            v_strip = v.get().replace(" ", "")
-            if (n.get()) and (v_strip):
-                if dt == "int":
-                    val = int(v_strip)
-                elif dt == "float":
-                    val = float(v_strip)
-                elif dt == "bool":
-                    val = bool(strtobool(v_strip))
-                elif dt == "string":
-                    val = v_strip
-                else:
+        invalid = []
+        for line in parameters.splitlines():
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+
+            n = fields[0]
+            convert = (
+                BpodAcademy.SETTINGS_CONVERTERS.get(fields[-1])
+                if len(fields) > 2
+                else None
+            )
+
+            if convert is not None:
+                try:
+                    val = convert("".join(fields[1:-1]))
+                except ValueError:
+                    invalid.append(line.strip())
+                    continue
+            else:
+                v_strip = "".join(fields[1:])
+                for convert in BpodAcademy.SETTINGS_CONVERTERS.values():
                     try:
-                        val = int(v_strip)
-                    except ValueError as e:
-                        try:
-                            val = float(v_strip)
-                        except ValueError:
-                            try:
-                                val = bool(strtobool(v_strip))
-                            except ValueError:
-                                val = v_strip
-
-                settings_dict[n.get()] = val
+                        val = convert(v_strip)
+                        break
+                    except ValueError:
+                        pass
 
-        reply = self._remote_to_server(
-            ("SETTINGS", "CREATE", protocol, subject, settings_file, settings_dict)
-        )
-        if not reply:
+            settings_dict[n] = val
+
+        # report every bad line at once and leave the window open to fix them
+        if invalid:
             messagebox.showwarning(
-                "Failed to create settings file",
-                f"Could not create settings file {settings_file} for subject {subject} on protocol {protocol}. Please check server connections.",
-                parent=self,
+                "Invalid settings",
+                "Could not convert these settings to their type:\n"
+                + "\n".join(invalid),
+                parent=self.create_settings_window,
             )
+            return
 
-        if window is not None:
-            window.destroy()
+        # writing the file happens on the server, so don't block the gui on it
+        def create_settings_reply(reply):
+            self.fetch_cache.clear()
+            if not reply:
+                messagebox.showwarning(
+                    "Failed to create settings file",
+                    f"Could not create settings file {settings_file} for subject {subject} on protocol {protocol}. Please check server connections.",
+                    parent=self,
+                )
+
+        self.create_settings_window.withdraw()
+        self._remote_to_server_in_background(
+            ("SETTINGS", "CREATE", protocol, subject, settings_file, settings_dict),
+            create_settings_reply,
+        )
 
     def _set_camera_sync(self):
 
         # check if protocols are running
-        running = False
-        for i in range(len(self.bpod_frames)):
-            if self.bpod_frames[i].status == 2:
-                running = True
-
-        if running:
+        if any(fr.status == 2 for fr in self.bpod_frames):
             messagebox.showwarning(
                 "Protocol Running!",
                 "Please shut down all protocols to edit the camera sync device.",
@@ -940,8 +1182,8 @@ class BpodAcademy(Tk):
     def _update_camera_settings(self, bpod_id, camera_settings):
 
         self.cameras[bpod_id] = camera_settings
-        if bpod_id in self.cfg["bpod_ids"]:
-            bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        if bpod_id in self.bpod_index:
+            bpod_index = self.bpod_index[bpod_id]
             self.bpod_frames[bpod_index].camera_settings = camera_settings
 
     def _delete_logs_command(self):
@@ -967,108 +1209,200 @@ class BpodAcademy(Tk):
 
     def _change_port(self, bpod_id, bpod_serial):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         self.cfg["bpod_serials"][bpod_index] = bpod_serial
-        self.bpod_frames[bpod_index].serial_number.set(bpod_serial)
+        self.bpod_frames[bpod_index].serial_entry.set(bpod_serial)
 
     def _start_bpod(self, bpod_id, code):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         self.bpod_frames[bpod_index].start_bpod(code)
 
     def _end_bpod(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         self.bpod_frames[bpod_index].end_bpod()
 
-    def _start_bpod_protocol(self, bpod_id, protocol, subject, settings, camera):
+    def _start_bpod_protocol(
+        self, bpod_id, protocol, subject, settings, camera=None
+    ):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         self.bpod_frames[bpod_index].start_bpod_protocol(
             protocol, subject, settings, camera
         )
 
     def _stop_bpod_protocol(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         self.bpod_frames[bpod_index].stop_bpod_protocol()
 
-    def _listen_to_server(self):
+    def _start_listening(self):
 
-        try:
-            cmd = self.subscribe.recv_pyobj()
-        except zmq.Again:
-            cmd = None
+        self.listening = True
+        self.read_more_messages = None
 
-        if cmd is not None:
+        # wake up only when the sockets have messages, where tk can watch
+        # their file descriptors. windows has no tk file handlers, so poll
+        if platform.system() != "Windows":
+            self.listen_to_server = None
+            self.listen_fds = (
+                self.subscribe.getsockopt(zmq.FD),
+                self.dealer.getsockopt(zmq.FD),
+            )
+            for fd in self.listen_fds:
+                self.tk.createfilehandler(fd, READABLE, self._on_socket_readable)
+            self._read_server_messages()
+        else:
+            self.listen_interval = BpodAcademy.ZMQ_SUBSCRIBE_FREQUENCY_MS
+            self.listen_to_server = self.after(
+                self.listen_interval, self._listen_to_server
+            )
+
+    def _stop_listening(self):
+
+        self.listening = False
+        if self.read_more_messages is not None:
+            self.after_cancel(self.read_more_messages)
+        if self.listen_to_server is not None:
+            self.after_cancel(self.listen_to_server)
+        else:
+            for fd in self.listen_fds:
+                self.tk.deletefilehandler(fd)
+
+    def _on_socket_readable(self, fd, mask):
+
+        self._read_server_messages()
+
+    def _listen_to_server(self):
 
-            if cmd[0] == "BPOD":
+        received = self._read_server_messages()
 
-                if cmd[1] == "ADD":
+        # poll quickly while messages arrive or replies are due, and back off
+        # to the normal rate once things go quiet
+        if received or self.pending_requests:
+            self.listen_interval = BpodAcademy.ZMQ_SUBSCRIBE_FASTEST_MS
+        else:
+            self.listen_interval = min(
+                2 * self.listen_interval, BpodAcademy.ZMQ_SUBSCRIBE_FREQUENCY_MS
+            )
 
-                    bpod_id = cmd[2]
-                    bpod_serial = cmd[3]
-                    bpod_position = cmd[4]
-                    self.cfg["bpod_ids"].append(bpod_id)
-                    self.cfg["bpod_serials"].append(bpod_serial)
-                    self._add_box(bpod_id, bpod_serial, bpod_position)
+        if self.listening:
+            self.listen_to_server = self.after(
+                self.listen_interval, self._listen_to_server
+            )
 
-                elif cmd[1] == "REMOVE":
+    def _read_server_messages(self):
 
-                    bpod_id = cmd[2]
-                    self._remove_box(bpod_id)
+        if self.read_more_messages is not None:
+            self.after_cancel(self.read_more_messages)
+            self.read_more_messages = None
 
-                elif cmd[1] == "CHANGE_PORT":
+        # handle every message and reply received since the last check. zmq
+        # file descriptors are edge-triggered, so read until none are left,
+        # handing back to tk between batches so a burst cannot freeze the window
+        messages = []
+        received = False
+        for _ in range(BpodAcademy.ZMQ_READ_BATCH):
 
-                    bpod_id = cmd[2]
-                    bpod_serial = cmd[3]
-                    self._change_port(bpod_id, bpod_serial)
+            # a handler may close the academy, so stop once listening ends
+            ready = dict(self.poller.poll(0)) if self.listening else None
+            if not ready:
+                break
+            received = True
 
-            elif cmd[0] == "PROTOCOLS":
+            try:
+                if self.dealer in ready:
+                    self._handle_reply(self.dealer.recv_multipart(zmq.NOBLOCK))
+                if (self.subscribe in ready) and (self.listening):
+                    messages.append(self.subscribe.recv_pyobj(zmq.NOBLOCK))
+            except zmq.Again:
+                break
 
-                protocols = cmd[1]
-                self._refresh_protocols(protocols)
+        else:
 
-            elif cmd[0] == "CAMERAS":
+            if self.listening:
+                self.read_more_messages = self.after_idle(self._read_server_messages)
+
+        self._handle_server_messages(messages)
+
+        return received
+
+    def _create_message_handlers(self):
+
+        # server messages are dispatched on their first field (and the second
+        # for BPOD), each handler takes the remaining fields as arguments
+        self.bpod_message_handlers = {
+            "ADD": self._add_box_message,
+            "REMOVE": self._remove_box,
+            "CHANGE_PORT": self._change_port,
+        }
+        self.server_message_handlers = {
+            "BPOD": self._handle_bpod_message,
+            "PROTOCOLS": self._refresh_protocols,
+            "CAMERAS": self._update_camera_settings,
+            "START": self._start_bpod,
+            "RUN": self._start_bpod_protocol,
+            "STOP": self._stop_bpod_protocol,
+            "END": self._end_bpod,
+            "CLOSE": self._server_closed_message,
+        }
+
+    def _handle_server_messages(self, messages):
+
+        # only the latest camera settings for each box matter, so those are
+        # applied once after the rest of the batch. protocol refreshes are
+        # already coalesced by _refresh_protocols
+        cameras = {}
+        for cmd in messages:
+            if not self.listening:
+                return
+            if (cmd is not None) and (cmd[0] == "CAMERAS"):
+                cameras[cmd[1]] = cmd
+            else:
+                self._handle_server_message(cmd)
 
-                bpod_id = cmd[1]
-                camera_settings = cmd[2]
-                self._update_camera_settings(bpod_id, camera_settings)
+        for cmd in cameras.values():
+            if not self.listening:
+                return
+            self._handle_server_message(cmd)
 
-            elif cmd[0] == "START":
+    def _handle_server_message(self, cmd):
 
-                bpod_id = cmd[1]
-                code = cmd[2]
-                self._start_bpod(bpod_id, code)
+        if cmd is not None:
+            tag, *args = cmd
+            handler = self.server_message_handlers.get(tag)
+            if handler is not None:
+                handler(*args)
 
-            elif cmd[0] == "RUN":
+    def _handle_bpod_message(self, tag, *args):
 
-                bpod_id = cmd[1]
-                protocol = cmd[2]
-                subject = cmd[3]
-                settings = cmd[4]
-                camera = cmd[5] if len(cmd) > 5 else None
-                self._start_bpod_protocol(bpod_id, protocol, subject, settings, camera)
+        handler = self.bpod_message_handlers.get(tag)
+        if handler is not None:
+            handler(*args)
 
-            elif cmd[0] == "STOP":
+    def _add_box_message(self, bpod_id, bpod_serial, bpod_position):
 
-                bpod_id = cmd[1]
-                self._stop_bpod_protocol(bpod_id)
+        self.cfg["bpod_ids"].append(bpod_id)
+        self.cfg["bpod_serials"].append(bpod_serial)
+        self.cfg["bpod_positions"].append(bpod_position)
+        self._add_box(bpod_id, bpod_serial, bpod_position)
 
-            elif cmd[0] == "END":
+    def _server_closed_message(self):
 
-                bpod_id = cmd[1]
-                self._end_bpod(bpod_id)
+        messagebox.showwarning(
+            "Server Closed!",
+            "The BpodAcademy server has shut down. Please restart the server if you wish to run BpodAcademy.",
+        )
 
-            elif cmd[0] == "CLOSE":
+    def _check_running_protocols(self):
 
-                messagebox.showwarning(
-                    "Server Closed!",
-                    "The BpodAcademy server has shut down. Please restart the server if you wish to run BpodAcademy.",
-                )
+        for fr in self.bpod_frames:
+            if (fr.status == 2) and (fr.check_protocol):
+                fr._check_running_protocol()
 
-        self.listen_to_server = self.after(
-            BpodAcademy.ZMQ_SUBSCRIBE_FREQUENCY_MS, self._listen_to_server
+        self.check_protocols = self.after(
+            BpodAcademy.CHECK_PROTOCOL_MS, self._check_running_protocols
         )
 
     def _remote_to_server(self, msg, timeout=ZMQ_REQUEST_RCVTIMEO_MS):
@@ -1076,68 +1410,144 @@ class BpodAcademy(Tk):
         if self.request is not None:
 
             self.request.setsockopt(zmq.RCVTIMEO, timeout)
-            self.request.send_pyobj(msg)
 
             try:
+                self.request.send_pyobj(msg)
                 reply = self.request.recv_pyobj()
             except zmq.Again:
                 reply = None
 
             return reply
 
+    def _fetch_from_server(self, msg):
+
+        # subject and settings lists are asked for by every box and dialog,
+        # so a recent reply to the same request is reused
+        now = time.monotonic()
+        cached = self.fetch_cache.get(msg)
+        if (cached is not None) and (now - cached[0] < BpodAcademy.FETCH_CACHE_SEC):
+            return cached[1]
+
+        reply = self._remote_to_server(msg)
+        if reply is not None:
+            reply = tuple(reply)
+            self.fetch_cache[msg] = (now, reply)
+
+        return reply
+
+    def _remote_to_server_in_background(
+        self, msg, callback, timeout=ZMQ_REQUEST_RCVTIMEO_MS
+    ):
+
+        # the id frame is echoed back by the server's REP socket with the reply,
+        # so several requests can be in flight on the dealer at once
+        request_id = b"%d" % next(self.request_count)
+        self.dealer.send_multipart([request_id, b"", pickle.dumps(msg)])
+        self.pending_requests[request_id] = (
+            callback,
+            self.after(timeout, self._expire_request, request_id),
+        )
+
+        # sending can use up the edge on the dealer's file descriptor, so if
+        # a reply is already waiting the fd handler may never fire for it
+        if (
+            (self.listening)
+            and (self.read_more_messages is None)
+            and (self.dealer.getsockopt(zmq.EVENTS) & zmq.POLLIN)
+        ):
+            self.read_more_messages = self.after_idle(self._read_server_messages)
+
+    def _expire_request(self, request_id):
+
+        # no reply in time, a late reply will be ignored
+        pending = self.pending_requests.pop(request_id, None)
+        if pending is not None:
+            pending[0](None)
+
+    def _handle_reply(self, frames):
+
+        request_id, _, reply = frames
+        pending = self.pending_requests.pop(request_id, None)
+        if pending is not None:
+            callback, expire = pending
+            self.after_cancel(expire)
+            callback(pickle.loads(reply))
+
     def _close_bpod_academy(self):
 
-        self.after_cancel(self.listen_to_server)
+        # the window manager can ask again while bpods are still closing
+        if self.closing:
+            return
 
         if not self.remote:
-            closed = self._close_server(ask=True)
-            if closed == -1:
-                return
-            elif closed == 0:
+            # if the server is closed, quit once all bpods have been ended
+            closed = self._close_server(ask=True, callback=self._quit_bpod_academy)
+            if closed == 0:
                 self._disconnect_remote()
+                self._quit_bpod_academy()
         else:
             self._disconnect_remote()
+            self._quit_bpod_academy()
+
+    def _quit_bpod_academy(self):
+
+        self._stop_listening()
+        self.after_cancel(self.check_protocols)
 
         self.quit()
         self.destroy()
 
     def _start_all_bpods(self):
 
-        not_open = [
-            i for i in range(len(self.bpod_frames)) if self.bpod_frames[i].status == 0
-        ]
-
-        if len(not_open) > 0:
+        if any(fr.status == 0 for fr in self.bpod_frames):
 
             opening_window = Toplevel(self)
             opening_window.title("Starting Bpods")
             Label(opening_window, text="Starting all Bpods. Please wait...").pack()
-            opening_window.update()
-
-            res = self._remote_to_server(("BPOD", "START", "ALL"))
+            opening_window.grab_set()
 
-            opening_window.destroy()
+            ### Start closed Bpods together on the server, without blocking tk ###
+            def started_all(res):
+                opening_window.destroy()
+                if not res:
+                    messagebox.showerror(
+                        "Failure", "Failed to open all Bpods!", parent=self
+                    )
 
-            if not res:
-                messagebox.showerror("Failure", "Failed to open all Bpods!")
+            self._remote_to_server_in_background(
+                ("BPOD", "START", "ALL"), started_all
+            )
 
-    def _close_all_bpods(self):
+    def _close_all_bpods(self, callback=None):
 
-        if any([fr.status == 1 for fr in self.bpod_frames]):
+        if any(fr.status == 1 for fr in self.bpod_frames):
 
             closing_window = Toplevel(self)
             closing_window.title("Closing Bpods")
             Label(closing_window, text="Closing open Bpods. Please wait...").pack()
-            closing_window.update()
+            # the window keeps redrawing while waiting, but takes all input
+            closing_window.grab_set()
+
+            ### Close open Bpods together on the server, without blocking tk ###
+            def closed_all(res):
+                closing_window.destroy()
+                if not res:
+                    messagebox.showerror(
+                        "Failure", "Failed to close all Bpods!", parent=self
+                    )
+                if callback is not None:
+                    callback()
+
+            self._remote_to_server_in_background(("BPOD", "END", "ALL"), closed_all)
+
+        elif callback is not None:
 
-            ### Close open Bpods ###
-            for i in range(len(self.bpod_frames)):
-                if self.bpod_frames[i].status > 0:
-                    self.bpod_frames[i]._end_bpod()
+            callback()
 
-            closing_window.destroy()
+    def _close_server(self, ask=True, callback=None):
 
-    def _close_server(self, ask=True):
+        if self.closing:
+            return 1
 
         if ask:
 
@@ -1148,7 +1558,7 @@ class BpodAcademy(Tk):
             ):
 
                 ### check for running sessions ###
-                if any([fr.status == 2 for fr in self.bpod_frames]):
+                if any(fr.status == 2 for fr in self.bpod_frames):
                     messagebox.showwarning(
                         "Bpod protocol(s) are currently running. Please close open protocols before closing the BpodAcademy. Server",
                         parent=self,
@@ -1158,13 +1568,8 @@ class BpodAcademy(Tk):
 
                 else:
 
-                    self._close_all_bpods()
-
-                    ### Close BpodAcademy server ###
-                    self._remote_to_server(("CLOSE",))
-                    if hasattr(self, "server"):
-                        self.server.stop()
-                        self.server.close()
+                    self.closing = True
+                    self._close_all_bpods(callback=partial(self._stop_server, callback))
 
                     return 1
 
@@ -1172,6 +1577,34 @@ class BpodAcademy(Tk):
 
                 return 0
 
+    def _stop_server(self, callback=None):
+
+        ### Close BpodAcademy server ###
+        self._remote_to_server(("CLOSE",))
+        if hasattr(self, "server"):
+            self.server.stop()
+            self.server.close()
+        self.closing = False
+
+        if callback is not None:
+            callback()
+
+    def _get_training_configs(self):
+
+        # reopening a training config dialog reuses a recent list
+        if (self.training_configs_time is not None) and (
+            time.monotonic() - self.training_configs_time
+            < BpodAcademy.TRAINING_CONFIGS_CACHE_SEC
+        ):
+            return self.training_configs
+
+        training_configs = self._remote_to_server(("CONFIG", "TRAINING", "FETCH"))
+        if training_configs is not None:
+            self.training_configs = training_configs
+            self.training_configs_time = time.monotonic()
+
+        return training_configs
+
     def _save_training_config_window(self):
 
         save_config_window = Toplevel(self)
@@ -1182,7 +1615,7 @@ class BpodAcademy(Tk):
         ).grid(sticky="w", row=0, column=0, rowspan=2)
         config_file_name = StringVar(save_config_window)
 
-        existing_configs = self._remote_to_server(("CONFIG", "TRAINING", "FETCH"))
+        existing_configs = self._get_training_configs()
         Combobox(
             save_config_window, textvariable=config_file_name, values=existing_configs
         ).grid(sticky="nsew", row=0, column=1)
@@ -1204,15 +1637,14 @@ class BpodAcademy(Tk):
 
         if config_file_name:
 
-            bpod_ids = []
-            protocols = []
-            subjects = []
-            settings = []
-            for fr in self.bpod_frames:
-                bpod_ids.append(fr.bpod_id)
-                protocols.append(fr.protocol.get())
-                subjects.append(fr.subject.get())
-                settings.append(fr.settings.get())
+            self.training_configs_time = None
+
+            # one column per field, read straight from each frame's comboboxes
+            frames = self.bpod_frames
+            bpod_ids = [fr.bpod_id for fr in frames]
+            protocols = [fr.protocol_entry.get() for fr in frames]
+            subjects = [fr.subject_entry.get() for fr in frames]
+            settings = [fr.settings_entry.get() for fr in frames]
 
             self._remote_to_server(
                 (
@@ -1229,7 +1661,7 @@ class BpodAcademy(Tk):
 
     def _select_training_config(self, mode="load"):
 
-        training_configs = self._remote_to_server(("CONFIG", "TRAINING", "FETCH"))
+        training_configs = self._get_training_configs()
 
         if training_configs:
             choose_training_config_window = Toplevel(self)
@@ -1287,11 +1719,13 @@ class BpodAcademy(Tk):
             if training_config[:2] == ("CONFIG", "TRAINING"):
                 bpod_ids, protocols, subjects, settings = training_config[2:]
 
-                for i in range(len(bpod_ids)):
-                    this_bpod_ind = self.cfg["bpod_ids"].index(bpod_ids[i])
-                    self.bpod_frames[this_bpod_ind].protocol.set(protocols[i])
-                    self.bpod_frames[this_bpod_ind].subject.set(subjects[i])
-                    self.bpod_frames[this_bpod_ind].settings.set(settings[i])
+                for bpod_id, protocol, subject, setting in zip(
+                    bpod_ids, protocols, subjects, settings
+                ):
+                    fr = self.bpod_frames[self.bpod_index[bpod_id]]
+                    fr.protocol_entry.set(protocol)
+                    fr.subject_entry.set(subject)
+                    fr.settings_entry.set(setting)
 
             else:
 
@@ -1304,6 +1738,8 @@ class BpodAcademy(Tk):
 
         if training_config_file:
 
+            self.training_configs_time = None
+
             status = self._remote_to_server(
                 ("CONFIG", "TRAINING", "DELETE", training_config_file)
             )
@@ -1,5 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
+from functools import partial
+import pickle
 import zmq
 from PIL import Image, ImageTk
 from bpodacademy.exception import BpodAcademyError
@@ -14,7 +16,6 @@ class BpodFrame(tk.Frame):
     READY_COLOR = "chartreuse3"
     ON_COLOR = "light goldenrod"
     GRID_WIDTH = 15
-    CHECK_PROTOCOL_MS = 1000
     CHECK_SERVER_COMMANDS_MS = 1000
     ZMQ_REQUEST_RCVTIMEO_MS = 30000
 
@@ -24,8 +25,12 @@ class BpodFrame(tk.Frame):
         serial_number,
         camera_settings=None,
         status=(0,),
+        port_values=None,
+        protocol_values=None,
         request_socket=None,
         subscribe_socket=None,
+        background_request=None,
+        fetch_request=None,
         ip=None,
         port=None,
         parent=None,
@@ -35,15 +40,14 @@ class BpodFrame(tk.Frame):
         tk.Frame.__init__(self, parent)
         print(status)
         self.bpod_id = bpod_id
-        self.serial_number = tk.StringVar(self, value=serial_number)
         self.status = status[0] if status is not None else 0
+        # running protocols are polled by the parent BpodAcademy window
+        self.check_protocol = False
         if self.status == 2:
             print(status)
             try:
                 self.protocol_details = (status[1], status[2], status[3])
-                self.check_protocol = self.after(
-                    BpodFrame.CHECK_PROTOCOL_MS, self._check_running_protocol
-                )
+                self.check_protocol = True
             except:
                 self.protocol_details = (None, None, None)
         else:
@@ -51,6 +55,8 @@ class BpodFrame(tk.Frame):
         self.camera_settings = camera_settings
 
         self.remote = remote
+        self.background_request = background_request
+        self.fetch_request = fetch_request
 
         if (request_socket is None) or (subscribe_socket is None):
 
@@ -59,19 +65,29 @@ class BpodFrame(tk.Frame):
                     "No server communication! Must specify either request and subscribe socket OR ip and port to create sockets."
                 )
             else:
-                context = zmq.Context()
+                context = zmq.Context.instance()
                 self.request = context.socket(zmq.REQ)
+                self.request.setsockopt(zmq.LINGER, 0)
+                self.request.setsockopt(zmq.REQ_RELAXED, 1)
+                self.request.setsockopt(zmq.REQ_CORRELATE, 1)
                 self.request.connect(f"tcp://{ip}:{port}")
                 self.subscribe = context.socket(zmq.SUB)
+                self.subscribe.setsockopt(zmq.LINGER, 0)
                 self.subscribe.connect(f"tcp://{ip}:{port+1}")
         else:
             self.request = request_socket
             self.subscribe = subscribe_socket
 
-        self.bpod_ports = self._get_bpod_ports()
+        self.protocol_values = (
+            protocol_values if protocol_values is not None else self._get_protocols()
+        )
+        self.port_values = (
+            port_values if port_values is not None else self._get_port_values()
+        )
         self.camera_window = None
 
         self.create_frame()
+        self.serial_entry.set(serial_number)
 
     def _get_bpod_ports(self):
 
@@ -81,20 +97,70 @@ class BpodFrame(tk.Frame):
 
         return reply
 
+    def _get_port_values(self):
+
+        bpod_ports = self._get_bpod_ports()
+        bpod_ports = bpod_ports if bpod_ports is not None else []
+        return tuple(p[0] for p in bpod_ports) + ("EMU",)
+
+    def set_ports(self, port_values):
+
+        self.port_values = port_values
+        self.serial_entry["values"] = port_values
+
     def _remote_to_server(self, msg, timeout=ZMQ_REQUEST_RCVTIMEO_MS):
 
         if self.request is not None:
 
             self.request.setsockopt(zmq.RCVTIMEO, timeout)
-            self.request.send_pyobj(msg)
 
             try:
+                self.request.send_pyobj(msg)
                 reply = self.request.recv_pyobj()
             except zmq.Again:
                 reply = None
 
             return reply
 
+    def _get_camera_image(self):
+
+        # the server replies with the image shape and then the raw BGR pixels,
+        # which are read in place rather than unpickled into an array
+        if self.request is not None:
+
+            self.request.setsockopt(zmq.RCVTIMEO, BpodFrame.ZMQ_REQUEST_RCVTIMEO_MS)
+
+            try:
+                self.request.send_pyobj(("CAMERAS", "IMAGE", self.bpod_id))
+                frames = self.request.recv_multipart(copy=False)
+            except zmq.Again:
+                return None
+
+            if len(frames) < 2:
+                return None
+
+            shape = pickle.loads(frames[0].bytes)
+            size = (shape[1], shape[0])
+            if len(shape) == 3:
+                return Image.frombuffer(
+                    "RGB", size, frames[1].buffer, "raw", "BGR", 0, 1
+                )
+            else:
+                return Image.frombuffer(
+                    "L", size, frames[1].buffer, "raw", "L", 0, 1
+                )
+
+    def _remote_to_server_in_background(
+        self, msg, callback, timeout=ZMQ_REQUEST_RCVTIMEO_MS
+    ):
+
+        # use the parent's background requests when given, a standalone
+        # frame just waits for the reply on its own socket
+        if self.background_request is not None:
+            self.background_request(msg, callback, timeout)
+        else:
+            callback(self._remote_to_server(msg, timeout))
+
     def _no_server_message(self, cmd):
 
         tk.messagebox.showerror(
@@ -109,31 +175,42 @@ class BpodFrame(tk.Frame):
         if not protocols:
             self._no_server_message("PROTOCOLS")
 
-        return protocols
+        return tuple(protocols) if protocols is not None else ()
 
     def set_protocols(self, protocols):
 
+        self.protocol_values = protocols
         self.protocol_entry["values"] = protocols
 
+    def _fetch_from_server(self, msg):
+
+        # the parent may share (and cache) replies for list fetches
+        if self.fetch_request is not None:
+            return self.fetch_request(msg)
+        else:
+            return self._remote_to_server(msg)
+
     def _update_subject_list(self, event=None):
 
-        these_subs = self._remote_to_server(("SUBJECTS", "FETCH", self.protocol.get()))
+        these_subs = self._fetch_from_server(
+            ("SUBJECTS", "FETCH", self.protocol_entry.get())
+        )
         if these_subs:
             self.subject_entry["values"] = these_subs
-            self.subject.set("")
+            self.subject_entry.set("")
         else:
             self._no_server_message(("SUBJECTS", "FETCH"))
 
     def _update_settings_list(self, event=None):
 
-        these_settings = self._remote_to_server(
-            ("SETTINGS", "FETCH", self.protocol.get(), self.subject.get())
+        these_settings = self._fetch_from_server(
+            ("SETTINGS", "FETCH", self.protocol_entry.get(), self.subject_entry.get())
         )
         if these_settings is not None:
             if "DefaultSettings" not in these_settings:
-                these_settings.append("DefaultSettings")
+                these_settings = tuple(these_settings) + ("DefaultSettings",)
             self.settings_entry["values"] = these_settings
-            self.settings.set("")
+            self.settings_entry.set("")
         else:
             self._no_server_message("SETTINGS")
 
@@ -171,8 +248,7 @@ class BpodFrame(tk.Frame):
 
         self.serial_entry = ttk.Combobox(
             self,
-            textvariable=self.serial_number,
-            values=[p[0] for p in self.bpod_ports] + ["EMU"],
+            values=self.port_values,
             state=serial_selection_state,
             width=BpodFrame.GRID_WIDTH,
         )
@@ -185,14 +261,12 @@ class BpodFrame(tk.Frame):
 
         ### row 1: select protocol, switch gui, and start protocol
 
-        self.protocol = tk.StringVar(self, value=self.protocol_details[0])
         protocol_label = tk.Label(self, text="Protocol: ")
         protocol_label.grid(sticky="w", row=1, column=0)
 
         self.protocol_entry = ttk.Combobox(
             self,
-            textvariable=self.protocol,
-            values=self._get_protocols(),
+            values=self.protocol_values,
             state=protocol_selection_state,
             width=BpodFrame.GRID_WIDTH,
         )
@@ -216,12 +290,10 @@ class BpodFrame(tk.Frame):
 
         ### row 2: select subject, calibrate, stop protocol
 
-        self.subject = tk.StringVar(self, value=self.protocol_details[1])
         subject_label = tk.Label(self, text="Subject: ")
         subject_label.grid(sticky="w", row=2, column=0)
         self.subject_entry = ttk.Combobox(
             self,
-            textvariable=self.subject,
             state=protocol_selection_state,
             width=BpodFrame.GRID_WIDTH,
         )
@@ -246,18 +318,24 @@ class BpodFrame(tk.Frame):
 
         ### row 3: select settings, end bpod
 
-        self.settings = tk.StringVar(self, value=self.protocol_details[2])
         settings_label = tk.Label(self, text="Settings: ")
         settings_label.grid(sticky="w", row=3, column=0)
         self.settings_entry = ttk.Combobox(
             self,
-            textvariable=self.settings,
             state=protocol_selection_state,
             width=BpodFrame.GRID_WIDTH,
         )
         self.settings_entry.bind("<Button-1>", self._update_settings_list)
         self.settings_entry.grid(sticky="nsew", row=3, column=1)
 
+        # the comboboxes hold their own values, without a Tk variable each
+        for entry, value in zip(
+            (self.protocol_entry, self.subject_entry, self.settings_entry),
+            self.protocol_details,
+        ):
+            if value is not None:
+                entry.set(value)
+
         self.end_button = tk.Button(self, text="End Bpod", command=self._end_bpod)
         self.end_button.grid(sticky="nsew", row=3, column=2)
 
@@ -280,7 +358,7 @@ class BpodFrame(tk.Frame):
         if self.status == 0:
 
             reply = self._remote_to_server(
-                ("BPOD", "CHANGE_PORT", self.bpod_id, self.serial_number.get())
+                ("BPOD", "CHANGE_PORT", self.bpod_id, self.serial_entry.get())
             )
             if not reply:
                 self._no_server_message("BPOD CHANGE_PORT")
@@ -298,26 +376,40 @@ class BpodFrame(tk.Frame):
 
         else:
 
+            wait_dialog = None
             if window:
                 wait_dialog = tk.Toplevel(self)
                 wait_dialog.title("Starting Bpod")
                 tk.Label(wait_dialog, text="Please wait...").pack()
-                wait_dialog.update()
+                # only flush geometry; the main loop draws the dialog while
+                # the request runs in the background
+                wait_dialog.update_idletasks()
+
+            # the reply comes back through the parent's dealer socket, so the
+            # GUI stays responsive (a standalone frame waits for it)
+            self.start_button["state"] = "disabled"
+            self._remote_to_server_in_background(
+                ("BPOD", "START", self.bpod_id),
+                partial(self._start_bpod_reply, wait_dialog=wait_dialog),
+            )
 
-            reply = self._remote_to_server(("BPOD", "START", self.bpod_id))
-            if reply == -1:
-                tk.messagebox.showerror(
-                    "Failed to start Bpod!",
-                    f"Failed to start matlab process for {self.bpod_id}. "
-                    "Please check that Bpod device is plugged into computer. "
-                    "If this error persists, try restarting the computer.",
-                )
+    def _start_bpod_reply(self, reply, wait_dialog=None):
 
-            if (reply is None) or (reply == 0):
-                self._no_server_message("START")
+        self.start_button["state"] = "normal"
 
-            if window:
-                wait_dialog.destroy()
+        if reply == -1:
+            tk.messagebox.showerror(
+                "Failed to start Bpod!",
+                f"Failed to start matlab process for {self.bpod_id}. "
+                "Please check that Bpod device is plugged into computer. "
+                "If this error persists, try restarting the computer.",
+            )
+
+        if (reply is None) or (reply == 0):
+            self._no_server_message("START")
+
+        if wait_dialog is not None:
+            wait_dialog.destroy()
 
     def start_bpod(self, code):
 
@@ -418,7 +510,11 @@ class BpodFrame(tk.Frame):
 
         else:
 
-            if (not self.protocol.get()) or (not self.subject.get()):
+            # read each selection once
+            protocol = self.protocol_entry.get()
+            subject = self.subject_entry.get()
+
+            if (not protocol) or (not subject):
 
                 tk.messagebox.showerror(
                     "Protocol Not Started!",
@@ -433,9 +529,9 @@ class BpodFrame(tk.Frame):
                         "BPOD",
                         "RUN",
                         self.bpod_id,
-                        self.protocol.get(),
-                        self.subject.get(),
-                        self.settings.get(),
+                        protocol,
+                        subject,
+                        self.settings_entry.get(),
                         self.camera_settings,
                     )
                 )
@@ -469,14 +565,12 @@ class BpodFrame(tk.Frame):
 
     def start_bpod_protocol(self, protocol, subject, settings, camera):
 
-        self.check_protocol = self.after(
-            BpodFrame.CHECK_PROTOCOL_MS, self._check_running_protocol
-        )
+        self.check_protocol = True
         self.status = 2
         self.box_label["bg"] = BpodFrame.ON_COLOR
-        self.protocol.set(protocol)
-        self.subject.set(subject)
-        self.settings.set(settings)
+        self.protocol_entry.set(protocol)
+        self.subject_entry.set(subject)
+        self.settings_entry.set(settings)
         self.protocol_entry["state"] = "disabled"
         self.subject_entry["state"] = "disabled"
         self.settings_entry["state"] = "disabled"
@@ -489,15 +583,10 @@ class BpodFrame(tk.Frame):
             reply = self._remote_to_server(("BPOD", "QUERY", self.bpod_id))
 
             if reply is None:
+                self.check_protocol = False
                 self._no_server_message("QUERY")
-            else:
-                status = reply[0]
-                if status == 2:
-                    self.check_protocol = self.after(
-                        BpodFrame.CHECK_PROTOCOL_MS, self._check_running_protocol
-                    )
-                else:
-                    self._stop_bpod_protocol()
+            elif reply[0] != 2:
+                self._stop_bpod_protocol()
 
     def _stop_bpod_protocol(self):
 
@@ -528,7 +617,7 @@ class BpodFrame(tk.Frame):
 
     def stop_bpod_protocol(self):
 
-        self.after_cancel(self.check_protocol)
+        self.check_protocol = False
         self.status = 1
         self.box_label["bg"] = BpodFrame.READY_COLOR
         self.protocol_entry["state"] = "readonly"
@@ -549,10 +638,17 @@ class BpodFrame(tk.Frame):
 
         elif self.status == 1:
 
-            reply = self._remote_to_server(("BPOD", "END", self.bpod_id))
+            self.end_button["state"] = "disabled"
+            self._remote_to_server_in_background(
+                ("BPOD", "END", self.bpod_id), self._end_bpod_reply
+            )
 
-            if reply is None:
-                self._no_server_message("END")
+    def _end_bpod_reply(self, reply):
+
+        self.end_button["state"] = "normal"
+
+        if reply is None:
+            self._no_server_message("END")
 
     def end_bpod(self):
 
@@ -601,7 +697,7 @@ class BpodFrame(tk.Frame):
             "record_protocol": {
                 "value": default_camera_settings["record_protocol"],
                 "dtype": str,
-                "restriction": self._get_protocols(),
+                "restriction": self.protocol_values,
             },
         }
 
@@ -673,15 +769,9 @@ class BpodFrame(tk.Frame):
 
         if self.camera_window:
 
-            frame = self._remote_to_server(("CAMERAS", "IMAGE", self.bpod_id))
-
-            if frame is not None:
-
-                img = Image.fromarray(frame)
+            img = self._get_camera_image()
 
-                if frame.ndim == 3:
-                    b, g, r = img.split()
-                    img = Image.merge("RGB", (r, g, b))
+            if img is not None:
 
                 imgtk = ImageTk.PhotoImage(image=img)
                 self.camera_display_label.imgtk = imgtk
@@ -1,15 +1,15 @@
-from serial.tools import list_ports
 import platform
 import os
+import re
 from pathlib import Path
 import zmq
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import multiprocess as mp
-from multiprocess.pool import ThreadPool
 from multiprocess.queues import Queue
 import csv
-from scipy.io import savemat
-import shutil
+import io
+import pickle
 import traceback
 import time
 
@@ -23,28 +23,48 @@ from bpodacademy.camera import BpodAcademyCamera
 from bpodacademy.sync import BpodAcademyCameraSync
 from bpodacademy.logger import BpodAcademyLogger
 
+# matches Arduino / Teensyduino manufacturer strings
+_is_duino = re.compile("duino").search
+
 
 class BpodAcademyServer:
 
     ### Constants ###
     BPOD_DIR = os.getenv("BPOD_DIR")
     ZMQ_REPLY_WAIT_MS = 10
+    ZMQ_PUBLISH_HWM = 100000
+    SAVE_CONFIG_DELAY_SEC = 0.5
+    BPOD_WORKERS = 32
+    SETTINGS_COMPRESS_MIN = 4
+    BPOD_PORT_VIDS = frozenset((0x2341, 0x16C0))  # Arduino, PJRC (Teensy)
+
+    # encoded .mat file with an empty ProtocolSettings struct
+    _default_settings_bytes = None
 
     ### Utility functions ###
 
     @staticmethod
     def _get_bpod_ports():
 
+        from serial.tools import list_ports
+
         com_ports = list_ports.comports()
+        on_windows = platform.system() == "Windows"
         bpod_ports = []
         for p in com_ports:
-            if platform.system() == "Windows":
+            if on_windows:
+                # only COM devices can be Bpods, skip other entries early
+                if not p.device.startswith("COM"):
+                    continue
                 if (p.description is not None) and (
                     "USB Serial Device" in p.description
                 ):
                     bpod_ports.append((p.serial_number, p.device))
             else:
-                if (p.manufacturer is not None) and ("duino" in p.manufacturer):
+                # check the USB vendor id first, then the manufacturer string
+                if (p.vid in BpodAcademyServer.BPOD_PORT_VIDS) or _is_duino(
+                    p.manufacturer or ""
+                ):
                     bpod_ports.append((p.serial_number, p.device))
 
         return bpod_ports
@@ -68,6 +88,51 @@ class BpodAcademyServer:
 
         return devs
 
+    @staticmethod
+    def _copy_file(copy_from, copy_to):
+
+        import shutil
+
+        # opening the target for writing empties it, so never copy a file onto
+        # itself (shutil.copy raised SameFileError here)
+        if os.path.exists(copy_to) and os.path.samefile(copy_from, copy_to):
+            return False
+
+        # copy_file_range (Linux) copies inside the kernel, or reflinks on
+        # copy-on-write file systems, without a user space buffer
+        if hasattr(os, "copy_file_range"):
+            try:
+                with open(copy_from, "rb") as src, open(copy_to, "wb") as dst:
+                    remaining = os.fstat(src.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(
+                            src.fileno(), dst.fileno(), remaining
+                        )
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                # some file systems report 0 before the end, copy the normal way
+                if remaining == 0:
+                    shutil.copymode(copy_from, copy_to)
+                    return True
+            except OSError:
+                pass
+
+        # shutil.copy uses sendfile/fcopyfile where available
+        shutil.copy(copy_from, copy_to)
+
+        return True
+
+    @staticmethod
+    def _write_config_file(file_name, rows):
+
+        # write a temporary file and swap it in, so a crash mid-write
+        # cannot leave a truncated config file behind
+        tmp_file = file_name.with_suffix(".tmp")
+        with open(tmp_file, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(tmp_file, file_name)
+
     def __init__(self, bpod_dir=None, ip="*", port=5555):
 
         self.bpod_dir = bpod_dir if bpod_dir is not None else os.getenv("BPOD_DIR")
@@ -85,30 +150,46 @@ class BpodAcademyServer:
         # set up multiprocessing context
         self.ctx = mp.get_context("spawn")
 
+        # base directories
+        self.academy_dir = self.bpod_dir / "Academy"
+        self.protocol_dir = self.bpod_dir / "Protocols"
+        self.data_dir = self.bpod_dir / "Data"
+        self.calibration_dir = self.bpod_dir / "Calibration Files"
+        self.training_config_dir = self.academy_dir / "training"
+
         # initialize logger
-        self.log_dir = self.bpod_dir / "Academy" / "logs"
+        self.log_dir = self.academy_dir / "logs"
         self.log_queue = Queue(ctx=self.ctx)
         self.logger = BpodAcademyLogger(self.log_dir, self.log_queue)
         self.logger.start_logging()
 
         # read configuration files
-        self.cfg_file = Path(f"{self.bpod_dir}/Academy/AcademyConfig.csv")
-        self.cfg_file_camera = Path(f"{self.bpod_dir}/Academy/CameraConfig.csv")
+        self.cfg_file = self.academy_dir / "AcademyConfig.csv"
+        self.cfg_file_camera = self.academy_dir / "CameraConfig.csv"
+        self.save_config_time = None
         self._read_config()
 
         # initialize bpod process managers
         self.bpod_process = [None for bpod_id in self.cfg["bpod_ids"]]
         self.camera_process = [None for bpod_id in self.cfg["bpod_ids"]]
+        self.bpod_index = {b: i for i, b in enumerate(self.cfg["bpod_ids"])}
         self.bpod_ports = BpodAcademyServer._get_bpod_ports()
+        self.bpod_ports_by_serial = dict(self.bpod_ports)
+        self.dir_cache = {}
         self.camera_devices = BpodAcademyServer._get_cameras()
         self.camera_sync = None
 
-        # set up zmq sockets
-        context = zmq.Context()
+        # worker threads for commands sent to all bpods at once. threads are
+        # only spawned as needed and kept for the next START ALL / END ALL
+        self.executor = ThreadPoolExecutor(max_workers=BpodAcademyServer.BPOD_WORKERS)
+
+        # set up zmq sockets, on the process-wide context a local GUI also uses
+        context = zmq.Context.instance()
         self.reply = context.socket(zmq.REP)
         self.reply.setsockopt(zmq.RCVTIMEO, BpodAcademyServer.ZMQ_REPLY_WAIT_MS)
         self.reply.bind(f"tcp://{ip}:{port}")
         self.publish = context.socket(zmq.PUB)
+        self.publish.setsockopt(zmq.SNDHWM, BpodAcademyServer.ZMQ_PUBLISH_HWM)
         self.publish.bind(f"tcp://{ip}:{port+1}")
 
     def _read_config(self):
@@ -118,14 +199,18 @@ class BpodAcademyServer:
         bpod_positions = []
         bpod_status = []
 
-        if os.path.isfile(self.cfg_file):
+        # a missing file reads as empty, without a separate stat to check for it
+        try:
+            with open(self.cfg_file, newline="") as f:
+                cfg_rows = [row for row in csv.reader(f) if row]
+        except FileNotFoundError:
+            cfg_rows = []
 
-            cfg_reader = csv.reader(open(self.cfg_file, newline=""))
-            for i in cfg_reader:
-                bpod_ids.append(i[0])
-                bpod_serials.append(i[1])
-                bpod_positions.append((int(i[2]), int(i[3])))
-                bpod_status.append((0, None, None, None))
+        for i in cfg_rows:
+            bpod_ids.append(i[0])
+            bpod_serials.append(i[1])
+            bpod_positions.append((int(i[2]), int(i[3])))
+            bpod_status.append((0, None, None, None))
 
         self.cfg = {
             "bpod_dir": self.bpod_dir,
@@ -137,43 +222,60 @@ class BpodAcademyServer:
 
         self.cameras = {"CameraSync": None}
 
-        if os.path.isfile(self.cfg_file_camera):
+        try:
+            with open(self.cfg_file_camera, newline="") as f:
+                cfg_rows = [row for row in csv.reader(f) if row]
+        except FileNotFoundError:
+            cfg_rows = []
 
-            cfg_reader = csv.reader(open(self.cfg_file_camera, newline=""))
-            for i in cfg_reader:
+        for i in cfg_rows:
 
-                if i[0] == "CameraSync":
-                    self.cameras["CameraSync"] = int(i[1]) if i[1] else None
-                else:
-                    this_camera = {
-                        i[0]: {
-                            "device": i[1],
-                            "width": int(i[2]) if i[2] else None,
-                            "height": int(i[3]) if i[3] else None,
-                            "fps": int(i[4]) if i[4] else None,
-                            "exposure": int(i[5]) if i[5] else None,
-                            "gain": int(i[6]) if i[6] else None,
-                            "compression" : int(i[7]) if i[7] else None,
-                            "sync_channel": int(i[8]) if i[8] else None,
-                            "record_protocol": i[9] if (len(i) > 9 and i[9]) else None,
-                        }
+            if i[0] == "CameraSync":
+                self.cameras["CameraSync"] = int(i[1]) if i[1] else None
+            else:
+                this_camera = {
+                    i[0]: {
+                        "device": i[1],
+                        "width": int(i[2]) if i[2] else None,
+                        "height": int(i[3]) if i[3] else None,
+                        "fps": int(i[4]) if i[4] else None,
+                        "exposure": int(i[5]) if i[5] else None,
+                        "gain": int(i[6]) if i[6] else None,
+                        "compression" : int(i[7]) if i[7] else None,
+                        "sync_channel": int(i[8]) if i[8] else None,
+                        "record_protocol": i[9] if (len(i) > 9 and i[9]) else None,
                     }
-                    self.cameras.update(this_camera)
+                }
+                self.cameras.update(this_camera)
+
+    def _save_config_later(self):
+
+        # coalesce rapid edits into one write, done by the command loop
+        self.save_config_time = (
+            time.monotonic() + BpodAcademyServer.SAVE_CONFIG_DELAY_SEC
+        )
 
     def _save_config(self):
 
-        cfg_writer = csv.writer(open(self.cfg_file, "w", newline=""))
-        for n, s, p in zip(
-            self.cfg["bpod_ids"], self.cfg["bpod_serials"], self.cfg["bpod_positions"]
-        ):
-            cfg_writer.writerow([n, s, p[0], p[1]])
+        self.save_config_time = None
 
-        cfg_camera_writer = csv.writer(open(self.cfg_file_camera, "w", newline=""))
-        cfg_camera_writer.writerow(["CameraSync", self.cameras["CameraSync"]])
+        BpodAcademyServer._write_config_file(
+            self.cfg_file,
+            [
+                (n, s, p[0], p[1])
+                for n, s, p in zip(
+                    self.cfg["bpod_ids"],
+                    self.cfg["bpod_serials"],
+                    self.cfg["bpod_positions"],
+                )
+            ],
+        )
+
+        camera_rows = [("CameraSync", self.cameras["CameraSync"])]
         for i in self.cameras:
             if i != "CameraSync":
                 cam = self.cameras[i]
-                cfg_camera_writer.writerow(
+                camera_rows.append(
                     [
                         i,
                         cam["device"],
@@ -188,6 +290,8 @@ class BpodAcademyServer:
                     ]
                 )
 
+        BpodAcademyServer._write_config_file(self.cfg_file_camera, camera_rows)
+
     def start(self):
 
         self.server_open = True
@@ -200,6 +304,11 @@ class BpodAcademyServer:
 
         while self.server_open:
 
+            if (self.save_config_time is not None) and (
+                time.monotonic() >= self.save_config_time
+            ):
+                self._save_config()
+
             try:
                 cmd = self.reply.recv_pyobj()
             except zmq.Again:
@@ -271,6 +380,7 @@ class BpodAcademyServer:
                         elif cmd[1] == "REFRESH":
 
                             self.bpod_ports = BpodAcademyServer._get_bpod_ports()
+                            self.bpod_ports_by_serial = dict(self.bpod_ports)
                             self.reply.send_pyobj(True)
 
                     elif cmd[0] == "PROTOCOLS":
@@ -281,7 +391,7 @@ class BpodAcademyServer:
                         elif cmd[1] == "REFRESH":
                             self.reply.send_pyobj(True)
                             self.publish.send_pyobj(
-                                ("PROTOCOLS", self._load_protocols())
+                                ("PROTOCOLS", self._load_protocols(refresh=True))
                             )
 
                     elif cmd[0] == "SUBJECTS":
@@ -357,7 +467,15 @@ class BpodAcademyServer:
                         elif cmd[1] == "IMAGE":
                             bpod_id = cmd[2]
                             res = self._get_camera_image(bpod_id)
-                            self.reply.send_pyobj(res)
+                            # the pixels go out as their own frame without being
+                            # pickled. send a snapshot, the camera process keeps
+                            # writing into the shared buffer while zmq sends
+                            if res is not None:
+                                self.reply.send_multipart(
+                                    (pickle.dumps(res.shape), res.copy()), copy=False
+                                )
+                            else:
+                                self.reply.send_pyobj(res)
 
                         elif cmd[1] == "STOP":
                             bpod_id = cmd[2]
@@ -404,11 +522,6 @@ class BpodAcademyServer:
                             res = self._change_port(bpod_id, bpod_serial)
                             self.reply.send_pyobj(res)
 
-                            bpod_cfg_index = self.cfg["bpod_ids"].index(bpod_id)
-                            self.cfg["bpod_serials"][bpod_cfg_index] = bpod_serial
-                            self._save_config()
-                            self.publish.send_pyobj(cmd)
-
                         elif cmd[1] == "START":
 
                             res = (
@@ -441,7 +554,11 @@ class BpodAcademyServer:
 
                         elif cmd[1] == "QUERY":
 
-                            res = self._query_bpod_status(bpod_id)
+                            res = (
+                                self._query_bpod_status(bpod_id)
+                                if bpod_id != "ALL"
+                                else self._query_all_bpods()
+                            )
                             self.reply.send_pyobj(res)
 
                         elif cmd[1] == "STOP":
@@ -454,7 +571,11 @@ class BpodAcademyServer:
 
                         elif cmd[1] == "END":
 
-                            res = self._end_bpod(bpod_id)
+                            res = (
+                                self._end_bpod(bpod_id)
+                                if bpod_id != "ALL"
+                                else self._end_all_bpods()
+                            )
                             self.reply.send_pyobj(res)
 
                     elif cmd[0] == "CLOSE":
@@ -482,31 +603,65 @@ class BpodAcademyServer:
                     )
                 )
 
+        # write any pending config change, also when a CLOSE command ended the
+        # loop without stop() being called
+        if self.save_config_time is not None:
+            self._save_config()
+
     def stop(self):
 
         if self.camera_sync is not None:
             self.camera_sync.stop_sync_device()
         self.server_open = False
         self.command_thread.join()
+        self.executor.shutdown(wait=True)
 
     def close(self):
 
         self.reply.close()
         self.publish.close()
 
-    def _load_protocols(self):
+    def _cached_scan(self, key, directory, scan):
+
+        # directory scans are reused until the directory's mtime changes
+        mtime = os.stat(directory).st_mtime_ns
+        cached = self.dir_cache.get(key)
+        if (cached is None) or (cached[0] != mtime):
+            cached = (mtime, scan())
+            self.dir_cache[key] = cached
+
+        return list(cached[1])
+
+    def _load_protocols(self, refresh=False):
 
         # search protocol directory
         # return all protocols directories that contain a .m file of the same name
         protocols = []
-        protocol_dir = Path(f"{self.bpod_dir}/Protocols")
+        protocol_dir = self.protocol_dir
         if protocol_dir.exists():
-            candidates = [p for p in protocol_dir.iterdir() if p.is_dir()]
-            protocols = [c.stem for c in candidates if (c / f"{c.stem}.m").is_file()]
+
+            def scan():
+                # DirEntry caches the file type, so only the .m check needs a stat
+                with os.scandir(protocol_dir) as entries:
+                    found = [
+                        e.name
+                        for e in entries
+                        if e.is_dir()
+                        and os.path.isfile(os.path.join(e.path, f"{e.name}.m"))
+                    ]
+                found.sort()
+                return found
+
+            # adding a .m file inside a protocol folder does not change the
+            # mtime of the Protocols directory, and a Data/<subject>/<protocol>
+            # folder made outside the academy does not change the mtime of
+            # Data, so a refresh rescans everything
+            if refresh:
+                self.dir_cache.clear()
+            protocols = self._cached_scan("PROTOCOLS", protocol_dir, scan)
         else:
             os.makedirs(protocol_dir)
 
-        protocols.sort()
         return protocols
 
     def _load_subjects(self, protocol):
@@ -514,26 +669,49 @@ class BpodAcademyServer:
         # return subject directories from the data directory
         # that contain a subfolder for the selected protocol
         subs_on_protocol = []
-        data_dir = Path(f"{self.bpod_dir}/Data")
+        data_dir = self.data_dir
         if data_dir.exists():
-            candidates = [d for d in data_dir.iterdir() if d.is_dir()]
-            subs_on_protocol = [c.stem for c in candidates if (c / protocol).exists()]
+
+            def scan():
+                with os.scandir(data_dir) as entries:
+                    found = [
+                        e.name
+                        for e in entries
+                        if e.is_dir() and os.path.exists(os.path.join(e.path, protocol))
+                    ]
+                found.sort()
+                return found
+
+            subs_on_protocol = self._cached_scan(
+                ("SUBJECTS", protocol), data_dir, scan
+            )
         else:
             os.makedirs(data_dir)
 
-        subs_on_protocol.sort()
         return subs_on_protocol
 
     def _add_subject(self, protocol, subject):
 
-        sub_dir = Path(f"{self.bpod_dir}/Data/{subject}")
+        sub_dir = self.data_dir / subject
         sub_data_dir = sub_dir / protocol / "Session Data"
         sub_settings_dir = sub_dir / protocol / "Session Settings"
         sub_data_dir.mkdir(parents=True, exist_ok=True)
         sub_settings_dir.mkdir(parents=True, exist_ok=True)
 
+        # a new protocol folder for an existing subject does not change
+        # the mtime of the Data directory
+        self.dir_cache.pop(("SUBJECTS", protocol), None)
+
+        # the default settings file is always the same, so encode it once
+        if BpodAcademyServer._default_settings_bytes is None:
+            from scipy.io import savemat
+
+            def_settings = io.BytesIO()
+            savemat(def_settings, {"ProtocolSettings": {}})
+            BpodAcademyServer._default_settings_bytes = def_settings.getvalue()
+
         def_settings_file = sub_settings_dir / "DefaultSettings.mat"
-        savemat(def_settings_file, {"ProtocolSettings": {}})
+        def_settings_file.write_bytes(BpodAcademyServer._default_settings_bytes)
 
         return True
 
@@ -541,15 +719,25 @@ class BpodAcademyServer:
 
         # return settings files in Data/subject/protocol/Session Settings
         settings = []
-        data_dir = Path(f"{self.bpod_dir}/Data")
+        data_dir = self.data_dir
         if data_dir.exists():
             sub_dir = data_dir / subject
             settings_dir = sub_dir / protocol / "Session Settings"
-            settings = [s.stem for s in list(settings_dir.glob("*.mat"))]
+
+            def scan():
+                found = [s[:-4] for s in os.listdir(settings_dir) if s.endswith(".mat")]
+                found.sort()
+                return found
+
+            try:
+                settings = self._cached_scan(
+                    ("SETTINGS", protocol, subject), settings_dir, scan
+                )
+            except FileNotFoundError:
+                settings = []
         else:
             os.makedirs(data_dir)
 
-        settings.sort()
         return settings
 
     def _copy_settings(
@@ -562,8 +750,12 @@ class BpodAcademyServer:
         else:
             to_subject = [to_subject]
 
-        copy_from = Path(
-            f"{self.bpod_dir}/Data/{from_subject}/{from_protocol}/Session Settings/{from_settings}.mat"
+        copy_from = (
+            self.data_dir
+            / from_subject
+            / from_protocol
+            / "Session Settings"
+            / f"{from_settings}.mat"
         )
 
         ### check that copy_from exists
@@ -572,23 +764,40 @@ class BpodAcademyServer:
 
         for ts in to_subject:
 
-            copy_to = Path(
-                f"{self.bpod_dir}/Data/{ts}/{to_protocol}/Session Settings/{from_settings}.mat"
+            copy_to = (
+                self.data_dir
+                / ts
+                / to_protocol
+                / "Session Settings"
+                / f"{from_settings}.mat"
             )
 
-            shutil.copy(copy_from, copy_to)
+            BpodAcademyServer._copy_file(copy_from, copy_to)
+            self.dir_cache.pop(("SETTINGS", to_protocol, ts), None)
 
         return True
 
     def _create_settings_file(self, protocol, subject, settings_file, settings_dict):
 
+        from scipy.io import savemat
+
         subject = [subject] if subject != "All" else self._load_subjects(protocol)
 
+        # encode once and write the same bytes for every subject. compression
+        # only pays off once there are more than a handful of settings
+        settings_bytes = io.BytesIO()
+        savemat(
+            settings_bytes,
+            {"ProtocolSettings": settings_dict},
+            do_compression=len(settings_dict) > BpodAcademyServer.SETTINGS_COMPRESS_MIN,
+        )
+        settings_bytes = settings_bytes.getvalue()
+
         for s in subject:
-            full_file = Path(
-                f"{self.bpod_dir}/Data/{s}/{protocol}/Session Settings/{settings_file}.mat"
-            )
-            savemat(full_file, {"ProtocolSettings": settings_dict})
+            settings_dir = self.data_dir / s / protocol / "Session Settings"
+            full_file = settings_dir / f"{settings_file}.mat"
+            full_file.write_bytes(settings_bytes)
+            self.dir_cache.pop(("SETTINGS", protocol, s), None)
 
         return True
 
@@ -611,7 +820,7 @@ class BpodAcademyServer:
         # -2 = sync failed to start
         # -3 = writer failed to start
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         if (camera_settings is None) or (camera_settings["device"] is None):
             return 0
@@ -660,14 +869,14 @@ class BpodAcademyServer:
 
     def _get_camera_image(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         if self.camera_process[bpod_index] is not None:
             return self.camera_process[bpod_index].get_image()
         return None
 
     def _stop_camera(self, bpod_id, write_only=False):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         if write_only:
             res = self.camera_process[bpod_index].stop_write()
         else:
@@ -687,7 +896,9 @@ class BpodAcademyServer:
                 self._disconnect_camera_sync()
 
         if self.camera_sync is None:
-            sync_serial_port = [p[1] for p in self.bpod_ports if int(p[0]) == sync_serial][0]
+            sync_serial_port = next(
+                p[1] for p in self.bpod_ports if int(p[0]) == sync_serial
+            )
             self.camera_sync = BpodAcademyCameraSync(
                 sync_serial_port,
                 ctx=self.ctx,
@@ -712,18 +923,24 @@ class BpodAcademyServer:
 
     def _delete_logs(self):
 
-        [log_file.unlink() for log_file in self.log_dir.iterdir()]
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    os.unlink(entry.path)
+
         return True
 
     def _add_box(self, bpod_id, bpod_serial, bpod_position):
 
-        if bpod_id not in self.cfg["bpod_ids"]:
+        if bpod_id not in self.bpod_index:
 
+            self.bpod_index[bpod_id] = len(self.cfg["bpod_ids"])
             self.cfg["bpod_ids"].append(bpod_id)
             self.cfg["bpod_serials"].append(bpod_serial)
             self.cfg["bpod_status"].append((0, None, None, None))
             self.cfg["bpod_positions"].append(bpod_position)
             self.bpod_process.append(None)
+            self.camera_process.append(None)
             self._save_config()
             self.publish.send_pyobj(
                 ("BPOD", "ADD", bpod_id, bpod_serial, bpod_position)
@@ -737,28 +954,38 @@ class BpodAcademyServer:
 
     def _remove_box(self, bpod_id):
 
-        if bpod_id not in self.cfg["bpod_ids"]:
+        if bpod_id not in self.bpod_index:
 
             return False
 
         else:
 
-            bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+            # drop the box from every per-box list so the indices stay aligned
+            bpod_index = self.bpod_index.pop(bpod_id)
             self.cfg["bpod_ids"].pop(bpod_index)
             self.cfg["bpod_serials"].pop(bpod_index)
+            self.cfg["bpod_status"].pop(bpod_index)
+            self.cfg["bpod_positions"].pop(bpod_index)
             self._save_config()
-            if self.bpod_process[bpod_index] is not None:
-                self.bpod_process[bpod_index].close()
-            self.bpod_process.pop(bpod_index)
+            bpod_process = self.bpod_process.pop(bpod_index)
+            if bpod_process is not None:
+                bpod_process.close()
+            camera_process = self.camera_process.pop(bpod_index)
+            if camera_process is not None:
+                camera_process.stop_acquisition()
+
+            # only the boxes after the removed one shift down
+            for i in range(bpod_index, len(self.cfg["bpod_ids"])):
+                self.bpod_index[self.cfg["bpod_ids"][i]] = i
             self.publish.send_pyobj(("BPOD", "REMOVE", bpod_id))
 
             return True
 
     def _change_port(self, bpod_id, bpod_serial):
 
-        bpod_cfg_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_cfg_index = self.bpod_index[bpod_id]
         self.cfg["bpod_serials"][bpod_cfg_index] = bpod_serial
-        self._save_config()
+        self._save_config_later()
         self.publish.send_pyobj(("BPOD", "CHANGE_PORT", bpod_id, bpod_serial))
         return True
 
@@ -766,7 +993,7 @@ class BpodAcademyServer:
         self, config_file_name, bpod_ids, protocols, subjects, settings
     ):
 
-        training_config_dir = self.bpod_dir / "Academy" / "training"
+        training_config_dir = self.training_config_dir
         training_config_dir.mkdir(exist_ok=True)
 
         training_config_file = training_config_dir / f"{config_file_name}.csv"
@@ -779,7 +1006,7 @@ class BpodAcademyServer:
 
     def _get_training_configs(self):
 
-        training_config_dir = self.bpod_dir / "Academy" / "training"
+        training_config_dir = self.training_config_dir
         training_config_files = (
             [str(tcfg.stem) for tcfg in training_config_dir.iterdir()]
             if training_config_dir.is_dir()
@@ -789,9 +1016,7 @@ class BpodAcademyServer:
 
     def _load_training_config(self, training_config_file):
 
-        file_path = (
-            self.bpod_dir / "Academy" / "training" / f"{training_config_file}.csv"
-        )
+        file_path = self.training_config_dir / f"{training_config_file}.csv"
 
         bpod_ids = []
         protocols = []
@@ -809,9 +1034,7 @@ class BpodAcademyServer:
 
     def _delete_training_config(self, training_config_file):
 
-        file_path = (
-            self.bpod_dir / "Academy" / "training" / f"{training_config_file}.csv"
-        )
+        file_path = self.training_config_dir / f"{training_config_file}.csv"
 
         if file_path.is_file():
             file_path.unlink()
@@ -822,15 +1045,26 @@ class BpodAcademyServer:
 
     def _start_bpod(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        code = self._start_bpod_process(bpod_id)
+        self._publish_bpod_started(bpod_id, code)
+
+        return code
+
+    def _publish_bpod_started(self, bpod_id, code):
+
+        if code > 0:
+            self.publish.send_pyobj(("START", bpod_id, code))
+            self.cfg["bpod_status"][self.bpod_index[bpod_id]] = (1, None, None, None)
+
+    def _start_bpod_process(self, bpod_id):
+
+        bpod_index = self.bpod_index[bpod_id]
         bpod_serial = self.cfg["bpod_serials"][bpod_index]
 
         if bpod_serial == "EMU":
             bpod_port = "EMU"
         else:
-            serial_index = [s[0] == bpod_serial for s in self.bpod_ports]
-            serial_index = serial_index.index(True)
-            bpod_port = self.bpod_ports[serial_index][1]
+            bpod_port = self.bpod_ports_by_serial[bpod_serial]
 
         self.bpod_process[bpod_index] = BpodProcess(
             bpod_id,
@@ -848,17 +1082,14 @@ class BpodAcademyServer:
         # 2 if successful but no calibration file found for rig
 
         if res > 0:
-            cal_file = Path(
-                f"{self.bpod_dir}/Calibration Files/LiquidCalibration_{bpod_id}.mat"
+            cal_file = os.path.join(
+                self.calibration_dir, f"LiquidCalibration_{bpod_id}.mat"
             )
-            if cal_file.is_file():
+            if os.path.isfile(cal_file):
                 code = 1
             else:
                 code = 2
 
-            self.publish.send_pyobj(("START", bpod_id, code))
-            self.cfg["bpod_status"][bpod_index] = (1, None, None, None)
-
         else:
 
             code = res
@@ -873,29 +1104,36 @@ class BpodAcademyServer:
             if self.bpod_process[i] is None
         ]
 
-        try:
-
-            if len(not_open) > 0:
-
-                pool = ThreadPool(len(not_open))
-                pool.map(self._start_bpod, not_open)
-
-            return True
+        # start all bpods at once, but publish from this thread, the socket is
+        # not thread-safe. every box that started is published, even if
+        # another one failed
+        futures = [
+            (bpod_id, self.executor.submit(self._start_bpod_process, bpod_id))
+            for bpod_id in not_open
+        ]
 
-        except Exception as e:
+        success = True
+        for bpod_id, future in futures:
 
-            self.log_queue.put(
-                (
-                    "error",
-                    f"Server: error starting all bpod = {e}.\n{traceback.format_exc()}",
+            try:
+                code = future.result()
+            except Exception as e:
+                self.log_queue.put(
+                    (
+                        "error",
+                        f"Server: error starting bpod {bpod_id} = {e}.\n{traceback.format_exc()}",
+                    )
                 )
-            )
+                success = False
+                continue
 
-            return False
+            self._publish_bpod_started(bpod_id, code)
+
+        return success
 
     def _switch_bpod_gui(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         res = self.bpod_process[bpod_index].send_command(("GUI",))
         if (res is not None) and (res[0] == "GUI"):
@@ -905,7 +1143,7 @@ class BpodAcademyServer:
 
     def _calibrate_bpod(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         res = self.bpod_process[bpod_index].send_command(("CALIBRATE",))
         if (res is not None) and (res[0] == "CALIBRATE"):
@@ -929,11 +1167,13 @@ class BpodAcademyServer:
         # -2 = sync failed to start
         # -3 = writer failed to start
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         settings = settings if settings is not None else "DefaultSettings"
 
         # change the date the settings file was last modified to now
-        settings_file = self.bpod_dir / "Data" / subject / protocol / "Session Settings" / f"{settings}.mat"
+        settings_file = (
+            self.data_dir / subject / protocol / "Session Settings" / f"{settings}.mat"
+        )
         settings_file.touch(exist_ok=True)
 
         camera_res = 0
@@ -974,7 +1214,7 @@ class BpodAcademyServer:
 
     def _query_bpod_status(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         if self.bpod_process[bpod_index] is not None:
             res = self.bpod_process[bpod_index].send_command(("QUERY",))
@@ -988,9 +1228,16 @@ class BpodAcademyServer:
         else:
             return (0,)
 
+    def _query_all_bpods(self):
+
+        return {
+            bpod_id: self._query_bpod_status(bpod_id)
+            for bpod_id in self.cfg["bpod_ids"]
+        }
+
     def _stop_bpod_protocol(self, bpod_id, stop_camera_write_only=False):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
         res = self.bpod_process[bpod_index].send_command(("STOP",))
 
         time.sleep(0.25)
@@ -1015,7 +1262,7 @@ class BpodAcademyServer:
 
     def _end_bpod(self, bpod_id):
 
-        bpod_index = self.cfg["bpod_ids"].index(bpod_id)
+        bpod_index = self.bpod_index[bpod_id]
 
         res = self.bpod_process[bpod_index].send_command(("END",))
 
@@ -1025,6 +1272,46 @@ class BpodAcademyServer:
         else:
             return None
 
+    def _end_idle_bpod(self, bpod_index):
+
+        # leave bpods that are running a protocol open
+        status = self.bpod_process[bpod_index].send_command(("QUERY",))
+        if (status is None) or (status[0] != "QUERY") or (status[1] != 0):
+            return None
+
+        return self.bpod_process[bpod_index].send_command(("END",))
+
+    def _end_all_bpods(self):
+
+        open_index = [
+            i for i in range(len(self.bpod_process)) if self.bpod_process[i] is not None
+        ]
+
+        try:
+
+            if open_index:
+
+                # end all bpods at once, so closing takes as long as the slowest
+                # one. publish from this thread, the socket is not thread-safe
+                results = self.executor.map(self._end_idle_bpod, open_index)
+
+                for i, res in zip(open_index, results):
+                    if (res is not None) and (res[0] == "END") and (res[1] == 1):
+                        self.publish.send_pyobj(("END", self.cfg["bpod_ids"][i]))
+
+            return True
+
+        except Exception as e:
+
+            self.log_queue.put(
+                (
+                    "error",
+                    f"Server: error ending all bpods = {e}.\n{traceback.format_exc()}",
+                )
+            )
+
+            return False
+
 
 def main():
 
@@ -45,6 +45,7 @@ class SettingsWindow(tk.Toplevel):
 
         super().__init__(parent)
         self.title(title)
+        self.entry_vars = []
 
         if settings:
             self.settings = settings
@@ -175,6 +176,21 @@ class SettingsWindow(tk.Toplevel):
 
         self.destroy()
 
+    def destroy(self):
+        """ Destroy the window and release the Tcl variables behind its entries
+        """
+
+        super().destroy()
+
+        # values are copied into self.settings, so the variables can go now
+        # rather than whenever the StringVar objects are garbage collected
+        for v in self.entry_vars:
+            try:
+                self.tk.globalunsetvar(str(v))
+            except tk.TclError:
+                pass
+        self.entry_vars = []
+
     def get_values(self):
 
         val_dict = {}